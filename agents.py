@@ -1,5 +1,5 @@
 ###### agents.py
-# Speficies the `Member` class which is a subclass of a mesa.Agent. This 
+# Speficies the `Member` class, the agent that mesa's scheduler steps. This 
 # represents the agents of the model and handles characteristics, interacting, 
 # and has the dependent variable political participation.
 ####
@@ -8,13 +8,11 @@
 from utils import set_valid, distance_normalizer
 
 # External imports
+from math import sqrt
 import numpy as np
-import random
-from mesa import Agent
-import networkx as nx
 
 
-class Member(Agent):
+class Member():
     '''
     Description: an Agent object represents a person in a community that has a political
                  participation based on characteristics, which are in turn modified by
@@ -59,13 +57,20 @@ class Member(Agent):
         remove_social(): removes a few random connections from the agent with a probability determined 
                          by the Fermi-Dirac distribution. Choice of removal depends on similarity in on 
                          similarity in SES, and characteristics social, approaching and autonomous.
-        consider_connection(partner, method): Calculate the (Fermi Dirac) probability of agent being 
-                                              connected to 'potential agent' and based on method add or 
-                                              remove the connection randomly.
+        consider_connections(partner_ids, method): Calculate the (Fermi Dirac) probabilities of agent being
+                                                   connected to each 'potential agent' at once, and based on
+                                                   method add or remove the connections randomly.
         - update_pp(): updates the political participation of the agent, based on its
                        characteristics.
     '''
 
+    # Fixed attributes instead of a __dict__ per agent, which saves memory and speeds up
+    # attribute access in large populations. Member doesn't subclass mesa.Agent, which has no
+    # __slots__: the scheduler only needs unique_id and step()
+    __slots__ = ['unique_id', 'model', 'until_eligible', 'vote_duty', 'active', 'overt', 'autonomous',
+                 'approaching', 'continuous', 'outtaking', 'expressive', 'social', 'ses', 'pps',
+                 'time_in_community', 'contacts']
+
     def __init__(self,
                  unique_id,
                  model,
@@ -105,13 +110,16 @@ class Member(Agent):
         self.pps = None
         self.move_community() # Happens to do all the steps necessary for initialization
 
-        # Initialize social connections homophilysed on similarity
+        # Initialize social connections homophilysed on similarity (the model looks up the
+        # traits of agents by unique_id, so it must know this agent already)
         if self.model.network == "homophily":
+            self.model.agents[self.unique_id] = self
             self.new_social()
             self.remove_social()
 
-        # Initialize ppz
-        self.update_pp()
+        # Initialize ppz (in batched mode the model updates all agents at once)
+        if not self.model.batched_pp:
+            self.update_pp()
 
 
     def step(self):
@@ -119,38 +127,47 @@ class Member(Agent):
         Description: performs 1 timestep of the agent
         '''
 
+        instruments = self.model.instruments
+
         # Subject to stimulus
         if self.model.stimulus:
-            self.stimulus(self.model.characteristics_affected.keys())
+            with instruments.phase('stimulus'):
+                self.stimulus(self.model.characteristics_affected.keys())
 
         # Interact
-        if random.uniform(0, 1) < self.model.prob_interaction:
-            self.interact()
+        if self.model.interact_draws[self.unique_id] < self.model.prob_interaction:
+            with instruments.phase('interact'):
+                self.interact()
 
         # Modify connections if model is dynamic
         if self.model.dynamic:
+            with instruments.phase('rewire'):
                 self.new_social()
                 self.remove_social()
 
         # Move community
-        if random.uniform(0, 1) < self.model.prob_move:
-            self.move_community()
+        if self.model.move_draws[self.unique_id] < self.model.prob_move:
+            with instruments.phase('move'):
+                self.move_community()
 
-        # Update parameters 
-        self.age()
-        self.update_pp()
+        # Update parameters (in batched mode the model updates pps after all agents stepped)
+        with instruments.phase('update_pp'):
+            self.age()
+            if not self.model.batched_pp:
+                self.update_pp()
 
 
-    def modify_characteristic(self, characteristic):
+    def modify_characteristic(self, characteristic, draw):
         '''
         Description: calculates how much a certain characteristic should change when agent
                      is subjected to a stimulus
         Inputs:
             - characteristics: name of the characteristic to modify
+            - draw: random 0 or 1 of the agent for this characteristic (see Party_model.draw_step)
         Outputs:
             - modification to characteristics
         '''
-        return 3 * (self.model.characteristics_affected[characteristic] - random.randint(0, 1)) / (self.autonomous + self.continuous)
+        return 3 * (self.model.characteristics_affected[characteristic] - draw) / (self.autonomous + self.continuous)
 
 
     def stimulus(self, affected):
@@ -165,24 +182,26 @@ class Member(Agent):
             return
 
         # Adjust these characteristics because of stimulus
+        draws = dict(zip(affected, self.model.stimulus_draws[self.unique_id].tolist()))
         if 'active' in affected:
-            self.active = set_valid(self.modify_characteristic('active') + self.active)
+            self.active = set_valid(self.modify_characteristic('active', draws['active']) + self.active)
         if 'overt' in affected:
-            self.overt = set_valid(self.modify_characteristic('overt') + self.overt)
+            self.overt = set_valid(self.modify_characteristic('overt', draws['overt']) + self.overt)
         if 'continuous' in affected:
-            self.continuous = set_valid(self.modify_characteristic('continuous') + self.continuous)
+            self.continuous = set_valid(self.modify_characteristic('continuous', draws['continuous']) + self.continuous)
         if 'expressive' in affected:
-            self.expressive = set_valid(self.modify_characteristic('expressive') + self.continuous)
+            self.expressive = set_valid(self.modify_characteristic('expressive', draws['expressive']) + self.continuous)
         if 'outtaking' in affected:
-            self.outtaking = set_valid(self.modify_characteristic('outtaking') + self.continuous)
+            self.outtaking = set_valid(self.modify_characteristic('outtaking', draws['outtaking']) + self.continuous)
 
 
-    def interaction_modifier(self, partner):
+    def interaction_modifier(self, partner, draw):
         '''
         Description: calculates how characteristics should be modified based on an interaction
                      with another agent
         Inputs:
             - partner: agent that is being interacted with. modification is based on similarity
+            - draw: uniform random number that decides whether the interaction is cynical
         Outputs:
             - modification to characteristics
         '''
@@ -190,21 +209,21 @@ class Member(Agent):
         # Set modification based on characteristics
         mod = 1 / (self.autonomous + self.continuous)
 
-        # Modify less when interaction is cynical
-        if random.randint(0, int(19 * self.ses)) == 0:
+        # Modify less when interaction is cynical (with probability 1 / (int(19 * ses) + 1))
+        if draw * (int(19 * self.ses) + 1) < 1:
             mod /= 10
 
         # Modify based on similarity between participants
         return mod / distance_normalizer(self.distance(partner))
 
 
-    def accept_interaction(self):
+    def accept_interaction(self, draw):
         '''
         Description: checks whether agent would have an interaction
         Inputs:
-            - 
+            - draw: uniform random number that decides whether the agent is willing to interact
         '''
-        return self.pps < 3 and random.randint(0, 1)
+        return self.pps < 3 and draw < .5
 
 
     def interact(self):
@@ -212,39 +231,45 @@ class Member(Agent):
         Description: attempts to interact with another agent, changing both their characteristics
         '''
 
+        # Random numbers of this interaction, drawn for all agents at once (see Party_model.draw_step)
+        accept, pick, path_draw, partner_accept, cynical, partner_cynical = self.model.interaction_draws[self.unique_id].tolist()
+
         # Check whether personality would lead to interaction
-        if not self.accept_interaction():
+        self.model.instruments.count('interactions')
+        if not self.accept_interaction(accept):
             return
         
-        # Pick interaction partner from friends
-        partner = random.choice(self.model.agents)
-        while partner == self:
-            partner = random.choice(self.model.agents)
-
-        # Calculate path length
-        if not nx.has_path(self.model.graph, self, partner):
+        # Pick interaction partner from all other agents
+        partner_id = int(pick * (self.model.n_agents - 1))
+        partner = self.model.agents[partner_id + (partner_id >= self.unique_id)]
+
+        # Calculate path length (paths longer than the cutoff of the index count as no path)
+        self.model.instruments.count('path_lookups')
+        path_length = self.model.paths.path_length(self.unique_id, partner.unique_id)
+        if path_length is None:
             return
-        path_length = nx.shortest_path_length(self.model.graph, self, partner)
 
         # Calculate probability that interaction is accepted based on path length where
         # P_i(len = 1) ~= 0.9 
         # P_i(len = 2) ~= 0.3
         # P_i(len = 3) ~= 0.1
-        if 1 / (1 + np.exp(self.model.fermi_alpha * (path_length - self.model.fermi_b))) < random.random():
+        if 1 / (1 + np.exp(self.model.fermi_alpha * (path_length - self.model.fermi_b))) < path_draw:
             return
 
         # Check whether partner's personality would lead to interaction
-        if not partner.accept_interaction():
+        if not partner.accept_interaction(partner_accept):
             return
         
         # Interact
-        mod = self.interaction_modifier(partner)
-        p_mod = partner.interaction_modifier(self)
+        mod = self.interaction_modifier(partner, cynical)
+        p_mod = partner.interaction_modifier(self, partner_cynical)
 
         if self.approaching > partner.approaching:
             partner.approaching = set_valid(partner.approaching + p_mod)
+            self.model.trait_distances.changed([partner.unique_id])
         else:
             self.approaching = set_valid(self.approaching + mod)
+            self.model.trait_distances.changed([self.unique_id])
 
         pps_diff = self.pps - partner.pps
         if pps_diff >= 0:
@@ -290,10 +315,12 @@ class Member(Agent):
         Outputs:
             - distance between agents' characteristics
         """
-        friend_charact = np.array([self.social, self.autonomous, self.approaching, self.ses])
-        p_friend_charact = np.array([partner.social, partner.autonomous, partner.approaching, partner.ses])
+        social = self.social - partner.social
+        autonomous = self.autonomous - partner.autonomous
+        approaching = self.approaching - partner.approaching
+        ses = self.ses - partner.ses
 
-        return np.linalg.norm((friend_charact - p_friend_charact))
+        return sqrt(social * social + autonomous * autonomous + approaching * approaching + ses * ses)
 
 
     #### Adepted from https://github.com/MbBrainz/ABM-project-group8/blob/main/polarization/core/model.py
@@ -303,7 +330,7 @@ class Member(Agent):
         Description: creates a list of ids that the agent is connected to in the
                      social network
         """
-        return list(self.model.graph[self]) if self in self.model.graph.adj.keys() else []
+        return self.model.graph.neighbours(self.unique_id)
 
 
     @property
@@ -312,7 +339,8 @@ class Member(Agent):
         Description: creates a list of ids that the agent is not connected to in the
         social network
         """
-        return [id for id in self.model.graph.nodes if (id not in self.socials_ids + [self])]
+        neighbours = set(self.model.graph.neighbours(self.unique_id))
+        return [id for id in self.model.graph.nodes if id != self.unique_id and id not in neighbours]
     
 
     def new_social(self):
@@ -322,17 +350,10 @@ class Member(Agent):
                       social, approaching and autonomous.
         '''
         
-        # Determine how large the pool of potential candidates is, depending on
-        # how many unconnected nodes are left or how many nodes we want to max
-        # add per step
-        n_potentials = min(len(self.unconnected_ids), self.model.edges_per_step)
+        # Randomly select at most edges_per_step people the agent is not connected to
+        pot_make_ids = self.model.graph.sample_unconnected(self.unique_id, self.model.edges_per_step, self.model.rng)
 
-        # randomly select 'n_potentials' from people the agent is not connected to
-        pot_make_ids = np.random.choice(self.unconnected_ids, size=n_potentials, replace=False)
-
-        for potential in self.model.schedule.agents:
-            if potential in pot_make_ids:
-                self.consider_connection(potential, method="ADD")
+        self.consider_connections(pot_make_ids, method = "ADD")
         
 
     def remove_social(self):
@@ -342,41 +363,37 @@ class Member(Agent):
                      similarity in SES, and characteristics social, approaching and autonomous.
         '''
         
-        # Determine how large the pool of potential candidates is, depending on
-        # how many unconnected nodes are left or how many edges we want to max
-        # add per step
-        if not self.socials_ids:
-            return
-        n_potentials = min(len(self.socials_ids), self.model.edges_per_step)
-
-        # randomly select 'n_potentials' from the agent's network
-        pot_break_ids = np.random.choice(self.socials_ids, size=n_potentials, replace=False)
+        # Randomly select at most edges_per_step people from the agent's network
+        pot_break_ids = self.model.graph.sample_neighbours(self.unique_id, self.model.edges_per_step, self.model.rng)
 
         # Remove connections
-        for potential in self.model.schedule.agents:
-            if potential in pot_break_ids:
-                self.consider_connection(potential, method = "REMOVE")
+        self.consider_connections(pot_break_ids, method = "REMOVE")
 
 
-    def consider_connection(self, partner, method):
+    def consider_connections(self, partner_ids, method):
         """
-        Description: Calculate the (Fermi Dirac) probability of agent being connected 
-                     to 'potential agent' and based on method add or remove the 
-                     connection randomly.
+        Description: Calculate the (Fermi Dirac) probabilities of agent being connected 
+                     to each 'potential agent' at once, and based on method add or remove
+                     the connections randomly.
         Inputs:
-            partner: the agent to consider
+            partner_ids: unique_ids of the agents to consider
             method: "ADD" or "REMOVE", whether the consideration is to add or remove 
-                    a link
+                    links
         """
-        p_ij = 1 / ( 1 + np.exp(self.model.fermi_alpha * (self.distance(partner) - self.model.fermi_b)))
+        p_ij = self.model.fermi_dirac(self.unique_id, partner_ids)
+        draws = self.model.link_draws[self.unique_id, int(method == "REMOVE"), :len(partner_ids)]
 
         if method == "ADD":
-            if p_ij > random.random():
-                self.model.graph.add_edge(self, partner)
+            for partner_id in np.asarray(partner_ids)[p_ij > draws].tolist():
+                self.model.instruments.count('edges_added')
+                self.model.paths.edge_changed(self.unique_id, partner_id)
+                self.model.graph.add_edge(self.unique_id, partner_id)
 
         if method == "REMOVE":
-            if p_ij < random.random():
-                self.model.graph.remove_edge(self, partner)
+            for partner_id in np.asarray(partner_ids)[p_ij < draws].tolist():
+                self.model.instruments.count('edges_removed')
+                self.model.paths.edge_changed(self.unique_id, partner_id)
+                self.model.graph.remove_edge(self.unique_id, partner_id)
     ####
 
 
@@ -386,64 +403,65 @@ class Member(Agent):
                      characteristics. This is based on the Ruegin model, and works 
                      hierarchically (n must be reached before n+1 is considered)
         '''
-        self.pps =  0 if random.uniform(0, 1) > .1 else 1
+        self.pps =  0 if self.model.pp_draws[self.unique_id] > .1 else 1
+        thresholds = self.model.thresholds[self.unique_id]
 
         # Agents that aren't eligible do not have to update their pps
         if self.until_eligible:
             return
 
         # Increase the level based on characteristics, and stop as soon as 1 check fails.
-        if self.vote_duty or self.active + self.approaching - (5 / 3) * self.ses > random.randint(2, 4):
+        if self.vote_duty or self.active + self.approaching - (5 / 3) * self.ses > thresholds[0]:
             self.pps = 2
         else:
             return
 
-        if self.active + self.overt + self.approaching + self.social + ((2.5 * self.contacts ) / self.time_in_community) > random.randint(12, 18):
+        if self.active + self.overt + self.approaching + self.social + ((2.5 * self.contacts ) / self.time_in_community) > thresholds[1]:
             self.pps = 3
         else:
             return
 
-        if self.overt + self.expressive > random.randint(4, 6):
+        if self.overt + self.expressive > thresholds[2]:
             self.pps = 4
         else:
             return
 
-        if self.overt + self.autonomous + self.approaching + self.outtaking > random.randint(10, 14):
+        if self.overt + self.autonomous + self.approaching + self.outtaking > thresholds[3]:
             self.pps = 5
         else:
             return
 
-        if self.active + self.approaching - self.outtaking + self.expressive - self.social > random.randint(1, 3):
+        if self.active + self.approaching - self.outtaking + self.expressive - self.social > thresholds[4]:
             self.pps = 6
         else:
             return
 
-        if self.overt + self.social + (2.5 * self.contacts ) / self.time_in_community > random.randint(7, 11):
+        if self.overt + self.social + (2.5 * self.contacts ) / self.time_in_community > thresholds[5]:
             self.pps = 7
         else:
             return
 
-        if self.active + self.overt + self.approaching + self.outtaking + self.expressive + (5 / 3) * self.ses > random.randint(15, 21):
+        if self.active + self.overt + self.approaching + self.outtaking + self.expressive + (5 / 3) * self.ses > thresholds[6]:
             self.pps = 8
         else:
             return
 
-        if self.continuous + self.expressive + (5 / 3) * self.ses > random.randint(7, 11):
+        if self.continuous + self.expressive + (5 / 3) * self.ses > thresholds[7]:
             self.pps = 9
         else:
             return
 
-        if self.active + self.overt + self.continuous + (5 / 3) * self.ses > random.randint(10, 14):
+        if self.active + self.overt + self.continuous + (5 / 3) * self.ses > thresholds[8]:
             self.pps = 10
         else:
             return
 
-        if self.active + self.overt + self.approaching + self.continuous + (2.5 * self.contacts) / self.time_in_community + (5 / 3) * self.ses > random.randint(15, 21):
+        if self.active + self.overt + self.approaching + self.continuous + (2.5 * self.contacts) / self.time_in_community + (5 / 3) * self.ses > thresholds[9]:
             self.pps = 11
         else:
             return
 
-        if self.active + self.overt + self.autonomous + self.approaching + self.continuous - self.outtaking + (2.5 * self.contacts) / self.time_in_community + (5 / 3) * self.ses > random.randint(15, 21):
+        if self.active + self.overt + self.autonomous + self.approaching + self.continuous - self.outtaking + (2.5 * self.contacts) / self.time_in_community + (5 / 3) * self.ses > thresholds[10]:
             self.pps = 12
         else:
             return
@@ -0,0 +1,170 @@
+###### bench.py
+# Benchmarks the model for each network structure, number of agents and static or
+# dynamic network. Times construction, steps and data collection separately, and
+# measures the peak memory of each case in a fresh process. Results are saved as
+# json in results/benchmarks/, and can be compared with an earlier benchmark to
+# catch slowdowns of the hot paths in agents.py and party.py.
+####
+
+# Internal imports
+from utils import make_path, get_config, make_seed
+
+# External imports
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from importlib import import_module
+from time import perf_counter, strftime
+import subprocess
+import resource
+import platform
+import json
+
+
+def bench_case(config, engine, network, n_agents, dynamic, n_steps):
+    '''
+    description: builds and runs 1 model, timing each phase (in a fresh worker process)
+    inputs:
+        - config: name of the config file in configs/
+        - engine: simulation engine to use ('agents' or 'vectorized')
+        - network: network structure of the model
+        - n_agents: number of agents in the model
+        - dynamic: whether the network structure changes over time
+        - n_steps: number of steps to time
+    outputs:
+        - dictionary with the case and its timings (in seconds) and peak memory (in MB)
+    '''
+    from runner import make_model
+
+    # Libraries the models import lazily, so importing them isn't timed as construction
+    for library in ['scipy.stats', 'networkx']:
+        import_module(library)
+
+    params = get_config(config)
+    params.engine = engine
+    params.n_agents = n_agents
+    params.n_iterations = n_steps
+
+    # Construction (including initializing agents and the first data collection)
+    start = perf_counter()
+    model = make_model(params, network, make_seed(params.seed, 0), dynamic = dynamic)
+    construct = perf_counter() - start
+
+    # Time data collection separately from the rest of each step
+    collect_time = 0
+    collect = model.datacollector.collect
+    def timed_collect(model):
+        nonlocal collect_time
+        start = perf_counter()
+        collect(model)
+        collect_time += perf_counter() - start
+    model.datacollector.collect = timed_collect
+
+    start = perf_counter()
+    for step in range(n_steps):
+        model.step()
+    total = perf_counter() - start
+
+    return {'engine' : engine,
+            'network' : network,
+            'n_agents' : n_agents,
+            'dynamic' : dynamic,
+            'n_edges' : model.graph.number_of_edges(),
+            'construct' : construct,
+            'step' : (total - collect_time) / n_steps,
+            'collect' : collect_time / n_steps,
+            'peak_memory' : resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def commit_hash():
+    '''
+    description: returns the hash of the current git commit, if there is one
+    '''
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    '''
+    description: prints the cases that got slower than in an earlier benchmark
+    inputs:
+        - results: list of results of the current benchmark
+        - baseline: list of results of the earlier benchmark
+        - threshold: ratio above which a case counts as slower
+    '''
+    key = lambda case : (case['engine'], case['network'], case['n_agents'], case['dynamic'])
+    baseline = {key(case) : case for case in baseline if 'skipped' not in case}
+    for case in results:
+        if 'skipped' in case or key(case) not in baseline:
+            continue
+        for phase in ['construct', 'step', 'collect', 'peak_memory']:
+            ratio = case[phase] / max(baseline[key(case)][phase], 1e-9)
+            if ratio > threshold:
+                print(f'slower: {key(case)} {phase} x{ratio:.2f}')
+
+
+def add_arguments(parser):
+    '''
+    description: adds the command line arguments of bench.py to a parser
+    inputs:
+        - parser: argparse parser (or subcommand parser of cli.py)
+    '''
+    parser.add_argument('config', nargs = '?', default = 'normal', help = 'name of the config file in configs/')
+    parser.add_argument('--engines', nargs = '+', default = ['agents'], help = 'simulation engines to benchmark')
+    parser.add_argument('--networks', nargs = '+', default = ['not_connected', 'homophily', 'holme_kim', 'fully_connected'])
+    parser.add_argument('--sizes', nargs = '+', type = int, default = [100, 1000, 10000], help = 'numbers of agents')
+    parser.add_argument('--steps', type = int, default = 10, help = 'number of steps to time per case')
+    parser.add_argument('--max-edges', type = float, default = 5e6, help = 'skip cases with more links than this')
+    parser.add_argument('--compare', help = 'earlier benchmark file to compare with')
+    parser.add_argument('--threshold', type = float, default = 1.2, help = 'slowdown ratio to report when comparing')
+
+
+def main(args):
+    '''
+    description: benchmarks all cases, saves the results in results/benchmarks/, and compares
+                 them with an earlier benchmark if one is given
+    inputs:
+        - args: parsed command line arguments (see add_arguments)
+    '''
+    from network import pick_backend
+
+    results = []
+    for engine in args.engines:
+        for network in args.networks:
+            for n_agents in args.sizes:
+                for dynamic in [False, True]:
+                    case = {'engine' : engine, 'network' : network, 'n_agents' : n_agents, 'dynamic' : dynamic}
+
+                    # A fully connected network has a link between every 2 agents (unless it is implicit)
+                    backend = pick_backend(get_config(args.config).graph_backend, network, dynamic)
+                    if network == 'fully_connected' and backend != 'implicit' and n_agents * (n_agents - 1) / 2 > args.max_edges:
+                        results.append({**case, 'skipped' : 'too many links'})
+                        continue
+
+                    # Run every case in a new process, so peak memory is measured per case
+                    with ProcessPoolExecutor(max_workers = 1, max_tasks_per_child = 1) as executor:
+                        result = executor.submit(bench_case, args.config, engine, network, n_agents, dynamic, args.steps).result()
+                    results.append(result)
+                    print(f"{engine:>10} {network:>15} {n_agents:>6} {'dynamic' if dynamic else 'static':>7}: "
+                          f"construct {result['construct']:.3f}s, step {result['step']:.4f}s, "
+                          f"collect {result['collect']:.5f}s, peak memory {result['peak_memory']:.0f}MB")
+
+    # Save results
+    commit = commit_hash()
+    path = make_path('benchmarks')
+    with open(f"{path}bench_{strftime('%Y%m%d-%H%M%S')}.json", 'w') as file:
+        json.dump({'commit' : commit,
+                   'python' : platform.python_version(),
+                   'steps' : args.steps,
+                   'results' : results}, file, indent = 1)
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            compare(results, json.load(file)['results'], args.threshold)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'Benchmarks the model for several network types and sizes.')
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,151 @@
+###### cache.py
+# Specifies the Result_cache class, an on-disk cache of the compact results of
+# single runs of the model. Results are stored under a hash of everything that
+# determines them (the resolved config values, the network, the varied parameters
+# and the seed), so running the same model again loads its results instead of
+# simulating it. The cache has a maximum size, above which the least recently used
+# results are removed.
+####
+
+# Internal imports
+from utils import make_path, config_values
+
+# External imports
+import numpy as np
+import hashlib
+import json
+import os
+
+
+# Config values that don't change the results of a single run
+IGNORED_PARAMS = ['n_runs', 'n_distinct_samples', 'networks', 'problem', 'seed', 'checkpoint_every', 'cache_size',
+                  'max_runs', 'ci_width']
+
+
+def inputs_hash(params, **inputs):
+    '''
+    description: hashes the config values that can change the results of a run (see
+                 IGNORED_PARAMS), together with other inputs of the run
+    inputs:
+        - params: parameters imported from config/[name].py
+        - inputs: other inputs to include in the hash, which must be json serializable
+    outputs:
+        - hexadecimal hash
+    '''
+    config = {name : value for name, value in config_values(params).items() if name not in IGNORED_PARAMS}
+    content = {'config' : config, **inputs}
+    return hashlib.sha256(json.dumps(content, sort_keys = True, default = str).encode()).hexdigest()
+
+
+class Result_cache():
+    '''
+    Description: a Result_cache saves the results of runs in results/cache/[key].npz, where
+                 the key is a hash of the inputs of the run, and keeps the total size of the
+                 cache below max_size by removing the least recently used results.
+    Inputs:
+        - max_size: maximum size of the cache in MB (0 disables the cache)
+        - folder: optional, folder in results/ to keep the cache in
+    Functions:
+        - key(params, network, point, seed, kind): returns the key of a run
+        - get(key): returns the cached results of a run, or None
+        - put(key, results): adds the results of a run to the cache
+    '''
+
+    def __init__(self, max_size, folder = 'cache'):
+        self.max_size = max_size * 2**20
+        self.folder = folder
+        self.size = None
+
+
+    def path(self, key):
+        return f'{make_path(self.folder)}{key}.npz'
+
+
+    def key(self, params, network, point, seed, kind):
+        '''
+        Description: hashes everything that determines the results of a run. Runs without a
+                     base seed in the config are never reproduced, so they get no key.
+        Inputs:
+            - params: parameters imported from config/[name].py
+            - network: network structure of the run
+            - point: dictionary with the values of the varied parameters
+            - seed: numpy SeedSequence of the run
+            - kind: name of the kind of results that are stored (e.g. 'run' or 'voters')
+        Outputs:
+            - hexadecimal key, or None if the run can't be cached
+        '''
+        if not self.max_size or params.seed is None:
+            return None
+
+        return inputs_hash(params,
+                           network = network,
+                           point = {name : float(value) for name, value in point.items()},
+                           seed = [seed.entropy, list(seed.spawn_key)],
+                           kind = kind)
+
+
+    def get(self, key):
+        '''
+        Description: loads the cached results of a run, marking them as recently used
+        Inputs:
+            - key: key of the run (None is never cached)
+        Outputs:
+            - dictionary of numpy arrays, or None if the run is not cached
+        '''
+        if key is None:
+            return None
+        path = self.path(key)
+        try:
+            with np.load(path) as results:
+                results = dict(results)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return results
+
+
+    def put(self, key, results):
+        '''
+        Description: adds the results of a run to the cache, and removes the least recently
+                     used results when the cache grows beyond its maximum size
+        Inputs:
+            - key: key of the run (None is never cached)
+            - results: dictionary of numpy arrays
+        '''
+        if key is None:
+            return
+        path = self.path(key)
+        with open(path + '.tmp', 'wb') as file:
+            np.savez(file, **results)
+        os.replace(path + '.tmp', path)
+
+        # Only scan the whole cache when it may have grown too large
+        if self.size is None:
+            self.evict()
+        else:
+            self.size += os.path.getsize(path)
+            if self.size > self.max_size:
+                self.evict()
+
+
+    def evict(self):
+        '''
+        Description: removes the least recently used results until the cache fits in its
+                     maximum size, and updates the size of the cache
+        '''
+        folder = make_path(self.folder)
+        files = []
+        for name in os.listdir(folder):
+            if name.endswith('.npz'):
+                stat = os.stat(folder + name)
+                files.append((stat.st_mtime, stat.st_size, folder + name))
+
+        self.size = sum(file_size for mtime, file_size, path in files)
+        for mtime, file_size, path in sorted(files):
+            if self.size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= file_size
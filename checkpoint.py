@@ -0,0 +1,73 @@
+###### checkpoint.py
+# Saves the full state of a running model (agent state, social network, random
+# number generators, step counter, and the data collected so far) as arrays, and
+# restores a model from them, so long runs can be resumed after a crash. Works for
+# both Party_model and Vector_model.
+####
+
+# Internal imports
+from network import GRAPH_BACKENDS
+
+# External imports
+import numpy as np
+import json
+
+
+def get_state(model):
+    '''
+    description: collects the full state of a model as arrays
+    inputs:
+        - model: Party_model or Vector_model to save
+    outputs:
+        - dictionary of numpy arrays
+    '''
+    nodes, offsets, neighbours = model.graph.to_arrays()
+    recorder = model.datacollector
+    random_state = {'rng' : model.rng.bit_generator.state,
+                    'random' : model.random.getstate()}
+
+    return {**model.get_agent_state(),
+            'graph_backend' : np.array(model.graph.name),
+            'graph_nodes' : nodes,
+            'graph_offsets' : offsets,
+            'graph_neighbours' : neighbours,
+            'random_state' : np.array(json.dumps(random_state)),
+            'schedule_steps' : np.array(model.schedule.steps),
+            'running' : np.array(model.running),
+            'burn_in' : np.array(-1 if model.steady_state is None or model.steady_state.burn_in is None
+                                 else model.steady_state.burn_in),
+            'recorder_step' : np.array(recorder.step),
+            'recorded_steps' : recorder.steps,
+            'recorded_voters' : recorder.voters,
+            'recorded_pps' : recorder.pps,
+            **{f'instruments_{name}' : values for name, values in model.instruments.to_arrays().items()}}
+
+
+def set_state(model, state):
+    '''
+    description: restores a model to a state made by get_state. The model must have been
+                 created with the same parameters and network as the saved model.
+    inputs:
+        - model: Party_model or Vector_model to restore
+        - state: dictionary of numpy arrays
+    '''
+    if len(state['pps']) != model.n_agents:
+        raise ValueError(f"checkpoint has {len(state['pps'])} agents, but the model has {model.n_agents}")
+
+    model.set_agent_state(state)
+    backend = GRAPH_BACKENDS[state['graph_backend'].item()]
+    model.graph = backend.from_arrays(state['graph_nodes'], state['graph_offsets'], state['graph_neighbours'])
+    model.paths.clear()
+
+    random_state = json.loads(state['random_state'].item())
+    model.rng.bit_generator.state = random_state['rng']
+    version, internal, gauss = random_state['random']
+    model.random.setstate((version, tuple(internal), gauss))
+
+    model.schedule.steps = model.schedule.time = int(state['schedule_steps'])
+    model.running = bool(state['running'])
+    if model.steady_state is not None and state['burn_in'] >= 0:
+        model.steady_state.burn_in = int(state['burn_in'])
+    model.datacollector.restore(state['recorded_steps'], state['recorded_voters'], state['recorded_pps'], state['recorder_step'])
+    model.instruments.from_arrays({name[len('instruments_'):] : values for name, values in state.items()
+                                   if name.startswith('instruments_')})
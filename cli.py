@@ -0,0 +1,43 @@
+###### cli.py
+# Single command line entry point of the project, with a subcommand per script:
+# run, ofat, sobol, stats and bench (e.g. python cli.py run normal). Every script
+# only imports the simulation and plotting libraries once its subcommand is chosen,
+# so showing the help or starting a command is fast.
+####
+
+# Internal imports
+import run
+import ofat
+import sobol
+import stats
+import bench
+
+# External imports
+from argparse import ArgumentParser
+
+
+COMMANDS = {'run' : (run, 'runs the model for all network types in the config'),
+            'ofat' : (ofat, 'one-factor-at-a-time sensitivity analysis'),
+            'sobol' : (sobol, 'global (Sobol) sensitivity analysis'),
+            'stats' : (stats, 'statistical tests on the results of run'),
+            'bench' : (bench, 'benchmarks the model for several network types and sizes')}
+
+
+def make_parser():
+    '''
+    description: creates the parser with a subcommand per script
+    outputs:
+        - argparse parser
+    '''
+    parser = ArgumentParser(description = 'Political participation agent-based model.')
+    subparsers = parser.add_subparsers(dest = 'command', required = True)
+    for name, (module, help) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help = help, description = help[0].upper() + help[1:] + '.')
+        module.add_arguments(subparser)
+        subparser.set_defaults(func = module.main)
+    return parser
+
+
+if __name__ == '__main__':
+    args = make_parser().parse_args()
+    args.func(args)
@@ -22,10 +22,30 @@ prob_link = 1/2
 m_barabasi = 2
 fermi_alpha = 4
 fermi_b = 1.8
+path_cutoff = 4
+graph_backend = 'auto'
+distance_cache = 2000
 networks = ['not_connected', 'homophily', 'holme_kim', 'fully_connected']
+engine = 'agents'
+batched_pp = False
+seed = None
+record_stride = 1
+instrument = False
+checkpoint_every = None
+cache_size = 1000
+tail_window = 1000
+steady_state = False
+post_burn_in = 1000
+steady_check_every = 100
 
 # for sensitivity analysis
 n_distinct_samples = 10
 problem = {'num_vars': 4,
            'names': ['prob_stimulus', 'prob_interaction', 'prob_move', 'prob_link'],
-           'bounds': [[0, 0.25], [0, 0.25], [0, 0.1], [0.25, 0.75]]}
\ No newline at end of file
+           'bounds': [[0, 0.25], [0, 0.25], [0, 0.1], [0.25, 0.75]]}
+adaptive_runs = False
+max_runs = 50
+ci_width = 2
+early_stop = False
+stationary_window = 250
+stationary_tolerance = .5
@@ -0,0 +1,134 @@
+###### convergence.py
+# Contains the statistics used to decide when enough has been simulated: the
+# width of the confidence interval of the mean over replicates, whether the
+# voters of a single run have stopped changing, the mean of the voters over the
+# tail window of a run, and the Steady_state detector that finds the end of the
+# burn-in of a running model.
+####
+
+# External imports
+import numpy as np
+
+
+def ci_width(values):
+    '''
+    description: calculates the width of the 95% confidence interval of the mean of values
+    inputs:
+        - values: values of the independent replicates
+    outputs:
+        - width of the confidence interval (inf for fewer than 2 values)
+    '''
+    if len(values) < 2:
+        return np.inf
+    return 2 * 1.96 * np.std(values, ddof = 1) / np.sqrt(len(values))
+
+
+def is_stationary(voters, window, tolerance):
+    '''
+    description: checks whether a time series of voters has stopped changing, by comparing
+                 the means of its last 2 windows. The series counts as stationary when they
+                 differ less than tolerance times the standard deviation within the windows.
+    inputs:
+        - voters: recorded number of voters over time
+        - window: number of recordings per window
+        - tolerance: largest difference between the means, relative to the standard deviation
+    outputs:
+        - whether the series is stationary (False if it is shorter than 2 windows)
+    '''
+    if len(voters) < 2 * window:
+        return False
+    first = voters[-2 * window:-window]
+    last = voters[-window:]
+    spread = max(np.sqrt((first.var() + last.var()) / 2), 1)
+    return abs(first.mean() - last.mean()) <= tolerance * spread
+
+
+def tail_mean(steps, voters, end, window):
+    '''
+    description: calculates the mean number of voters over the tail window of a run, the
+                 recordings after step end - window and before step end
+    inputs:
+        - steps: recorded steps
+        - voters: number of voters per recorded step
+        - end: last step of the run
+        - window: length of the tail window in steps
+    outputs:
+        - mean number of voters in the tail window
+    '''
+    return voters[(steps > end - window) & (steps < end)].mean()
+
+
+def mser_truncation(values, batch = 5):
+    '''
+    description: finds the end of the burn-in of a time series with MSER-[batch]: the number
+                 of batch means to drop from the start that minimizes the squared standard
+                 error of the mean of the rest. The truncation is only trusted when it lies in
+                 the first half of the series, otherwise the series is still drifting.
+    inputs:
+        - values: time series
+        - batch: optional, number of values per batch mean
+    outputs:
+        - number of values to drop, or None if no trusted truncation was found
+    '''
+    n_batches = len(values) // batch
+    if n_batches < 10:
+        return None
+    means = np.reshape(values[:n_batches * batch], (n_batches, batch)).mean(axis = 1)
+
+    # Sum of squared errors of every suffix of the batch means, from the shortest suffix up
+    length = np.arange(1, n_batches + 1)
+    sums = np.cumsum(means[::-1])
+    squares = np.cumsum(means[::-1] ** 2)
+    mser = ((squares - sums ** 2 / length) / length ** 2)[::-1]
+
+    # Ignore the last few batches, whose tiny suffixes always have a small error
+    truncation = int(np.argmin(mser[:n_batches - 5]))
+    if truncation > n_batches // 2:
+        return None
+    return truncation * batch
+
+
+class Steady_state():
+    '''
+    Description: online detector of the end of the burn-in of the voters of a model. Every
+                 check_every steps it runs MSER-5 on all voters recorded so far, so the end of
+                 the burn-in moves later (or is lost) when the voters turn out to still drift.
+                 The model can stop once it ran post_burn_in steps after the current end, if the
+                 voters of those steps are stationary (see is_stationary).
+    Inputs:
+        - post_burn_in: number of steps to run after the end of the burn-in
+        - tolerance: largest difference between the mean voters of the 2 halves of the steps
+                     after the burn-in, relative to their standard deviation
+        - check_every: optional, number of steps between checks for the end of the burn-in
+    Functions:
+        - update(step, steps, voters): checks for the end of the burn-in, and returns whether
+                                       the model can stop
+    Attributes:
+        - burn_in: step at which the burn-in ended, according to the last check (None if not found)
+    '''
+
+    def __init__(self, post_burn_in, tolerance, check_every = 100):
+        self.post_burn_in = post_burn_in
+        self.tolerance = tolerance
+        self.check_every = check_every
+        self.burn_in = None
+
+
+    def update(self, step, steps, voters):
+        '''
+        Description: checks for the end of the burn-in (every check_every steps)
+        Inputs:
+            - step: current step of the model
+            - steps: recorded steps
+            - voters: number of voters per recorded step
+        Outputs:
+            - whether the model ran post_burn_in stationary steps after the end of the burn-in
+        '''
+        if step % self.check_every:
+            return False
+
+        truncation = mser_truncation(voters)
+        self.burn_in = None if truncation is None else int(steps[truncation])
+        if self.burn_in is None or step - self.burn_in < self.post_burn_in:
+            return False
+        return is_stationary(voters[truncation:], (len(voters) - truncation) // 2, self.tolerance)
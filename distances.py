@@ -0,0 +1,95 @@
+###### distances.py
+# Specifies the Trait_distances class, which calculates the distances between the
+# personality traits related to friendship (social, autonomous and approaching) and
+# the socio-economic status of agents. These distances determine how likely agents
+# are to link on the homophily and dynamic networks, and how much they influence
+# each other. Distances are calculated for whole batches of pairs at once, and for
+# small models all of them are kept in a matrix.
+####
+
+# External imports
+import numpy as np
+
+
+def trait_distance(traits, other_traits):
+    '''
+    description: calculates the Euclidean distance between the traits of pairs of agents,
+                 always adding the squared differences in the same order, so the distance of a
+                 pair doesn't depend on how it is calculated
+    inputs:
+        - traits: array with social, autonomous, approaching and ses in its last dimension
+        - other_traits: array of the same (or a broadcastable) shape
+    outputs:
+        - array of distances, with the shape of traits without its last dimension
+    '''
+    squares = traits - other_traits
+    squares *= squares
+    total = squares[..., 0] + squares[..., 1]
+    total += squares[..., 2]
+    total += squares[..., 3]
+    return np.sqrt(total)
+
+
+class Trait_distances():
+    '''
+    Description: calculates the distances between agents' traits for batches of pairs. For
+                 models with at most max_cached agents, the distances between all pairs are
+                 kept in a matrix, which is calculated the first time it is needed and updated
+                 when the traits of agents change.
+    Inputs:
+        - model: model object whose agents are compared. model.get_traits(agents) must return
+                 the social, autonomous, approaching and ses of the agents as an (n, 4) array
+                 (of all agents if agents is None)
+        - max_cached: optional, largest number of agents for which the matrix of all distances
+                      is kept (0 to never keep it)
+    Functions:
+        - between(agents, partners): returns the distance between the traits of pairs of agents
+        - changed(agents): updates the stored distances after the traits of agents changed
+    '''
+
+    def __init__(self, model, max_cached = 0):
+        self.model = model
+        self.max_cached = max_cached
+        self.traits = None
+        self.matrix = None
+
+
+    def between(self, agents, partners):
+        '''
+        Description: calculates the distances between the traits of pairs of agents
+        Inputs:
+            - agents: first agent of each pair (or 1 agent for all pairs)
+            - partners: second agent of each pair
+        Outputs:
+            - array with the distance per pair
+        '''
+        agents, partners = np.atleast_1d(np.asarray(agents, dtype = int)), np.atleast_1d(np.asarray(partners, dtype = int))
+        if self.model.n_agents > self.max_cached:
+            return trait_distance(self.model.get_traits(agents), self.model.get_traits(partners))
+
+        # Calculate the matrix a block of rows at a time, to limit the memory of the differences
+        if self.matrix is None:
+            self.traits = self.model.get_traits()
+            self.matrix = np.empty((len(self.traits), len(self.traits)))
+            for start in range(0, len(self.traits), 256):
+                self.matrix[start:start + 256] = trait_distance(self.traits[start:start + 256, None], self.traits[None])
+        return self.matrix[agents, partners]
+
+
+    def changed(self, agents = None):
+        '''
+        Description: updates the stored distances of agents whose traits changed (when the traits
+                     of many agents changed, the matrix is recalculated when it is needed again)
+        Inputs:
+            - agents: optional, agents whose traits changed (None for all agents)
+        '''
+        if self.matrix is None:
+            return
+        if agents is None or 4 * len(agents) > len(self.traits):
+            self.traits = self.matrix = None
+            return
+
+        self.traits[agents] = self.model.get_traits(agents)
+        rows = trait_distance(self.traits[agents][:, None], self.traits[None])
+        self.matrix[agents] = rows
+        self.matrix[:, agents] = rows.T
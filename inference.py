@@ -0,0 +1,170 @@
+###### inference.py
+# Contains the resampling tests that stats.py runs on the results of every run:
+# bootstrap confidence intervals of the mean over runs, and permutation tests of
+# whether any number of conditions differ (overall and per pair of conditions).
+# All resamples of a batch are drawn and evaluated as numpy arrays at once, and the
+# batches can be spread over worker processes. Batch b is always seeded with
+# make_seed(seed, ..., b), so the results don't depend on the number of workers.
+####
+
+# Internal imports
+from utils import make_seed
+
+# External imports
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+import numpy as np
+
+
+def bootstrap_means(values, n_resamples, seed):
+    '''
+    description: calculates the mean of values for a batch of bootstrap resamples
+    inputs:
+        - values: (runs,) or (runs, variables) array with a value per run
+        - n_resamples: number of resamples in the batch
+        - seed: numpy SeedSequence of the batch
+    outputs:
+        - (n_resamples,) or (n_resamples, variables) array of means
+    '''
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(values), (n_resamples, len(values)))
+    return values[picks].mean(axis = 1)
+
+
+def group_statistic(values, starts):
+    '''
+    description: calculates the sum of squares between groups, summed over the variables, for
+                 every row of values. For 2 groups this only depends on the squared difference
+                 between their means.
+    inputs:
+        - values: (rows, runs, variables) array with a value per run, on a common scale, with the
+                  runs of every group next to each other
+        - starts: index of the first run of each group
+    outputs:
+        - (rows,) array with the statistic per row
+    '''
+    sizes = np.diff(np.append(starts, values.shape[1]))[:, None]
+    sums = np.add.reduceat(values, starts, axis = 1)
+    grand = sums.sum(axis = 1, keepdims = True) / values.shape[1]
+    return ((sums / sizes - grand) ** 2 * sizes).sum(axis = (1, 2))
+
+
+def permuted_statistics(values, starts, n_resamples, seed):
+    '''
+    description: calculates group_statistic for a batch of random permutations of the runs over
+                 the groups
+    inputs:
+        - values: (runs, variables) array with a value per run, on a common scale, with the runs
+                  of every group next to each other
+        - starts: index of the first run of each group
+        - n_resamples: number of permutations in the batch
+        - seed: numpy SeedSequence of the batch
+    outputs:
+        - (n_resamples,) array with the statistic per permutation
+    '''
+    rng = np.random.default_rng(seed)
+    n_runs, n_variables = values.shape
+
+    # A single variable is shuffled directly, several variables are shuffled together by run
+    if n_variables == 1:
+        permuted = rng.permuted(np.broadcast_to(values[:, 0], (n_resamples, n_runs)), axis = 1)[..., None]
+    else:
+        permuted = values[rng.permuted(np.broadcast_to(np.arange(n_runs), (n_resamples, n_runs)), axis = 1)]
+    return group_statistic(permuted, starts)
+
+
+def resample(task, args, n_resamples, seed, key = (), workers = 1, batch = None):
+    '''
+    description: runs a resampling task in batches of at most batch resamples, one after another
+                 or spread over a pool of worker processes
+    inputs:
+        - task: function called as task(*args, n_resamples, seed) for every batch
+        - args: arguments of task that are the same for every batch
+        - n_resamples: total number of resamples
+        - seed: base seed (None for a random base seed)
+        - key: optional, integers identifying the task, used with the batch in make_seed
+        - workers: optional, number of worker processes (1 runs in this process)
+        - batch: optional, largest number of resamples per batch (by default at most 1000, and
+                 fewer for large values, to keep the memory of a batch in the order of 100MB)
+    outputs:
+        - array with the results of all batches, concatenated
+    '''
+    if batch is None:
+        batch = int(np.clip(2**23 // args[0].size, 1, 1000))
+    sizes = [min(batch, n_resamples - start) for start in range(0, n_resamples, batch)]
+    seeds = [make_seed(seed, *key, idx) for idx in range(len(sizes))]
+    if workers <= 1:
+        return np.concatenate([task(*args, size, batch_seed) for size, batch_seed in zip(sizes, seeds)])
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = [executor.submit(task, *args, size, batch_seed) for size, batch_seed in zip(sizes, seeds)]
+        return np.concatenate([future.result() for future in futures])
+
+
+def bootstrap_ci(values, n_resamples = 10000, level = 0.95, seed = None, key = (), workers = 1, batch = None):
+    '''
+    description: calculates a percentile bootstrap confidence interval of the mean over runs
+    inputs:
+        - values: (runs,) or (runs, variables) array with a value per run
+        - n_resamples: optional, number of bootstrap resamples
+        - level: optional, confidence level of the interval
+        - seed, key, workers, batch: optional, see resample
+    outputs:
+        - mean, lower and upper bound of the interval (per variable for 2D values)
+    '''
+    values = np.asarray(values, dtype = float)
+    means = resample(bootstrap_means, (values,), n_resamples, seed, key, workers, batch)
+    lower, upper = np.quantile(means, [(1 - level) / 2, (1 + level) / 2], axis = 0)
+    return values.mean(axis = 0), lower, upper
+
+
+def standardize(groups):
+    '''
+    description: pools the values of all groups, with every variable divided by its pooled
+                 standard deviation, so all variables count equally in group_statistic
+    inputs:
+        - groups: list with a (runs,) or (runs, variables) array per group
+    outputs:
+        - (runs, variables) array with the pooled values, and the index of the first run of each group
+    '''
+    values = np.concatenate([np.reshape(np.asarray(group, dtype = float), (len(group), -1)) for group in groups])
+    spread = values.std(axis = 0)
+    values = values / np.where(spread > 0, spread, 1)
+    starts = np.cumsum([0] + [len(group) for group in groups[:-1]])
+    return values, starts
+
+
+def permutation_test(groups, n_resamples = 10000, seed = None, key = (), workers = 1, batch = None):
+    '''
+    description: permutation test of whether the mean over runs differs between any of the
+                 groups, using the sum of squares between groups (of all standardized variables)
+                 as test statistic
+    inputs:
+        - groups: list with a (runs,) or (runs, variables) array per group (condition)
+        - n_resamples: optional, number of permutations
+        - seed, key, workers, batch: optional, see resample
+    outputs:
+        - test statistic and p-value
+    '''
+    values, starts = standardize(groups)
+    statistic = group_statistic(values[None], starts)[0]
+    permuted = resample(permuted_statistics, (values, starts), n_resamples, seed, key, workers, batch)
+    return statistic, (1 + np.sum(permuted >= statistic * (1 - 1e-12))) / (1 + n_resamples)
+
+
+def pairwise_permutation_tests(groups, n_resamples = 10000, seed = None, workers = 1, batch = None):
+    '''
+    description: permutation tests between every pair of groups (see permutation_test), with
+                 Bonferroni-adjusted p-values
+    inputs:
+        - groups: list with a (runs,) or (runs, variables) array per group (condition)
+        - n_resamples: optional, number of permutations per pair
+        - seed, workers, batch: optional, see resample
+    outputs:
+        - (groups, groups) array of adjusted p-values (1 on the diagonal)
+    '''
+    p_values = np.ones((len(groups), len(groups)))
+    pairs = list(combinations(range(len(groups)), 2))
+    for first, second in pairs:
+        p_value = permutation_test([groups[first], groups[second]], n_resamples, seed, (first, second), workers, batch)[1]
+        p_values[first, second] = p_values[second, first] = min(1, p_value * len(pairs))
+    return p_values
@@ -0,0 +1,152 @@
+###### instruments.py
+# Specifies the Instruments class, which keeps cumulative timers per phase of a
+# step (stimulus, interacting, changing links, moving, updating political
+# participation) and counters of hot-path events, aggregated per step. Models
+# that are not instrumented use No_instruments, whose functions do nothing.
+####
+
+# External imports
+from contextlib import nullcontext
+from time import perf_counter
+import numpy as np
+import json
+
+
+class Phase():
+    '''
+    Description: context manager that adds the time spent inside it to a phase of Instruments
+    '''
+
+    def __init__(self, instruments, name):
+        self.instruments = instruments
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+
+    def __exit__(self, *exc):
+        times = self.instruments.step_times
+        times[self.name] = times.get(self.name, 0) + perf_counter() - self.start
+
+
+class Instruments():
+    '''
+    Description: collects the time spent per phase and counts of events, per step of a model.
+    Functions:
+        - phase(name): returns a context manager that times a phase
+        - count(name, n): adds n to a counter
+        - end_step(): closes the current step, storing its times and counts
+        - totals(): returns the total time per phase and total count per counter
+        - to_arrays(): returns the time per phase and count per counter per step
+        - from_arrays(arrays): replaces the closed steps with ones saved by to_arrays
+    '''
+
+    def __init__(self):
+        self.step_times = {}
+        self.step_counts = {}
+        self.history = []
+
+
+    def phase(self, name):
+        return Phase(self, name)
+
+
+    def count(self, name, n = 1):
+        self.step_counts[name] = self.step_counts.get(name, 0) + n
+
+
+    def end_step(self):
+        self.history.append((self.step_times, self.step_counts))
+        self.step_times = {}
+        self.step_counts = {}
+
+
+    def totals(self):
+        '''
+        Description: sums the times and counts of all closed steps
+        Outputs:
+            - dictionary with 'time_[phase]' in seconds and 'count_[counter]' per name
+        '''
+        return {name : values.sum().item() for name, values in self.to_arrays().items()}
+
+
+    def to_arrays(self):
+        '''
+        Description: formats the times and counts of all closed steps as arrays
+        Outputs:
+            - dictionary with an array per 'time_[phase]' and 'count_[counter]', with a value per step
+        '''
+        phases = sorted({name for times, counts in self.history for name in times})
+        counters = sorted({name for times, counts in self.history for name in counts})
+        arrays = {f'time_{name}' : np.array([times.get(name, 0.) for times, counts in self.history])
+                  for name in phases}
+        arrays.update({f'count_{name}' : np.array([counts.get(name, 0) for times, counts in self.history])
+                       for name in counters})
+        return arrays
+
+
+    def from_arrays(self, arrays):
+        '''
+        Description: replaces the closed steps with the steps of arrays made by to_arrays
+                     (e.g. from a checkpoint)
+        Inputs:
+            - arrays: dictionary with an array per 'time_[phase]' and 'count_[counter]'
+        '''
+        n_steps = max((len(values) for values in arrays.values()), default = 0)
+        self.history = [({}, {}) for step in range(n_steps)]
+        for name, values in arrays.items():
+            kind, name = name.split('_', 1)
+            for (times, counts), value in zip(self.history, values.tolist()):
+                (times if kind == 'time' else counts)[name] = value
+
+
+class No_instruments():
+    '''
+    Description: stand-in for Instruments when a model is not instrumented, which does nothing.
+    '''
+
+    null_phase = nullcontext()
+
+    def phase(self, name):
+        return self.null_phase
+
+    def count(self, name, n = 1):
+        pass
+
+    def end_step(self):
+        pass
+
+    def totals(self):
+        return {}
+
+    def to_arrays(self):
+        return {}
+
+    def from_arrays(self, arrays):
+        pass
+
+
+def add_totals(total, other):
+    '''
+    description: adds the totals of one set of instruments to another, in place
+    inputs:
+        - total: dictionary of totals to add to
+        - other: dictionary of totals to add
+    outputs:
+        - total
+    '''
+    for name, value in other.items():
+        total[name] = total.get(name, 0) + value
+    return total
+
+
+def save_totals(totals, path):
+    '''
+    description: writes totals of instruments to a json file, with the time per phase in
+                 seconds and the count per counter
+    inputs:
+        - totals: dictionary of totals
+        - path: file to write to
+    '''
+    with open(path, 'w') as file:
+        json.dump(totals, file, indent = 1, sort_keys = True)
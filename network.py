@@ -0,0 +1,657 @@
+###### network.py
+# Specifies the graph backends of the social network of the agents. Csr_graph
+# stores the neighbours of all nodes in 2 integer arrays, which is compact and fast
+# to search but can't change. Dynamic_graph keeps the neighbours of every node in an
+# indexable set, so that links can be added and removed, and random neighbours and
+# non-neighbours can be sampled, in time proportional to the number of nodes
+# sampled instead of the size of the network. Complete_graph and Empty_graph store no
+# links at all, answering queries about the fully connected and unconnected networks
+# analytically. All use the agents' unique ids as nodes and can be exported to networkx.
+####
+
+# External imports
+from itertools import chain
+import numpy as np
+
+
+class Neighbours():
+    '''
+    Description: a set of neighbour ids that also supports picking random elements, by
+                 keeping the elements in a list and their position in that list in a dict.
+    '''
+
+    def __init__(self):
+        self.items = []
+        self.positions = {}
+
+    def __contains__(self, node):
+        return node in self.positions
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, node):
+        if node in self.positions:
+            return
+        self.positions[node] = len(self.items)
+        self.items.append(node)
+
+    def remove(self, node):
+        # Move the last element into the position of the removed one
+        position = self.positions.pop(node)
+        last = self.items.pop()
+        if last != node:
+            self.items[position] = last
+            self.positions[last] = position
+
+
+class Dynamic_graph():
+    '''
+    Description: an undirected graph on integer node ids that stores the neighbours of each
+                 node in a Neighbours set. Supports the parts of the networkx Graph interface
+                 used by the model, and can be converted to and from networkx graphs.
+    Functions:
+        - neighbours(node): returns a list of the neighbours of a node
+        - distances_from(source, cutoff): returns the path lengths from a node to all nodes
+                                          within the cutoff
+        - from_networkx(graph): creates a Dynamic_graph with the nodes and edges of a networkx graph
+        - to_networkx(): creates a networkx graph with the same nodes and edges
+        - from_arrays(nodes, offsets, neighbours): creates a Dynamic_graph saved with to_arrays
+        - to_arrays(): returns the nodes and neighbour lists as arrays (e.g. for checkpoints)
+        - add_node(node): adds a node without neighbours
+        - add_edge(u, v): links 2 nodes, adding them if necessary
+        - remove_edge(u, v): removes the link between 2 nodes
+        - has_edge(u, v): checks whether 2 nodes are linked
+        - degree(node): returns the number of neighbours of a node
+        - number_of_edges(): returns the number of links in the graph
+        - sample_neighbours(node, k, rng): picks k random neighbours of a node
+        - sample_unconnected(node, k, rng): picks k random nodes that are not linked to a node
+    '''
+
+    name = 'dynamic'
+    implicit = False
+
+    def __init__(self, nodes = ()):
+        self.adj = {}
+        self.nodes = []
+        self.n_edges = 0
+        for node in nodes:
+            self.add_node(node)
+
+
+    @classmethod
+    def from_networkx(cls, graph):
+        dynamic_graph = cls(graph.nodes)
+        for u, v in graph.edges:
+            dynamic_graph.add_edge(u, v)
+        return dynamic_graph
+
+
+    def to_networkx(self):
+        import networkx as nx
+
+        graph = nx.Graph()
+        graph.add_nodes_from(self.nodes)
+        graph.add_edges_from((u, v) for u in self.nodes for v in self.adj[u] if u < v)
+        return graph
+
+
+    @classmethod
+    def from_arrays(cls, nodes, offsets, neighbours):
+        '''
+        Description: creates a Dynamic_graph from arrays made by to_arrays, with the nodes and
+                     the neighbours of every node in the same order, so sampling from the
+                     restored graph gives the same results as from the original
+        '''
+        dynamic_graph = cls(nodes.tolist())
+        neighbours = neighbours.tolist()
+        for idx, node in enumerate(dynamic_graph.nodes):
+            for other in neighbours[offsets[idx]:offsets[idx + 1]]:
+                dynamic_graph.adj[node].add(other)
+        dynamic_graph.n_edges = int(offsets[-1]) // 2
+        return dynamic_graph
+
+
+    def to_arrays(self):
+        '''
+        Description: formats the graph as arrays, where the neighbours of node nodes[i] are
+                     neighbours[offsets[i]:offsets[i + 1]]
+        Outputs:
+            - nodes, offsets and neighbours arrays
+        '''
+        offsets = np.zeros(len(self.nodes) + 1, dtype = np.int64)
+        np.cumsum([len(self.adj[node]) for node in self.nodes], out = offsets[1:])
+        neighbours = np.fromiter(chain.from_iterable(self.adj[node].items for node in self.nodes),
+                                 dtype = np.int32, count = offsets[-1])
+        return np.array(self.nodes, dtype = np.int32), offsets, neighbours
+
+
+    def __getitem__(self, node):
+        return self.adj[node]
+
+    def __contains__(self, node):
+        return node in self.adj
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+    def neighbours(self, node):
+        return list(self.adj[node]) if node in self.adj else []
+
+
+    def edge_array(self):
+        return np.array([(u, v) for u in self.nodes for v in self.adj[u] if u < v], dtype = np.int32).reshape(-1, 2)
+
+
+    def distances_from(self, source, cutoff = None):
+        '''
+        Description: calculates the path lengths from source to all nodes within the cutoff
+                     with a breadth-first search
+        Inputs:
+            - source: node to calculate path lengths from
+            - cutoff: optional, maximum path length (None for no maximum)
+        Outputs:
+            - dictionary with path length per reachable node
+        '''
+        lengths = {source : 0}
+        frontier = [source]
+        depth = 0
+        while frontier and (cutoff is None or depth < cutoff):
+            depth += 1
+            next_frontier = []
+            for node in frontier:
+                for neighbour in self.adj.get(node, ()):
+                    if neighbour not in lengths:
+                        lengths[neighbour] = depth
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+        return lengths
+
+
+    def add_node(self, node):
+        if node in self.adj:
+            return
+        self.adj[node] = Neighbours()
+        self.nodes.append(node)
+
+
+    def add_edge(self, u, v):
+        self.add_node(u)
+        self.add_node(v)
+        if v in self.adj[u]:
+            return
+        self.adj[u].add(v)
+        self.adj[v].add(u)
+        self.n_edges += 1
+
+
+    def remove_edge(self, u, v):
+        self.adj[u].remove(v)
+        self.adj[v].remove(u)
+        self.n_edges -= 1
+
+
+    def has_edge(self, u, v):
+        return u in self.adj and v in self.adj[u]
+
+    def degree(self, node):
+        return len(self.adj[node]) if node in self.adj else 0
+
+    def number_of_edges(self):
+        return self.n_edges
+
+
+    def sample_neighbours(self, node, k, rng):
+        '''
+        Description: picks k distinct random neighbours of a node (all of them if it has
+                     fewer than k neighbours)
+        Inputs:
+            - node: node to pick the neighbours of
+            - k: number of neighbours to pick
+            - rng: numpy random generator to draw from
+        Outputs:
+            - list of neighbours
+        '''
+        if node not in self.adj:
+            return []
+        neighbours = self.adj[node].items
+        return [neighbours[idx] for idx in rng.choice(len(neighbours), min(k, len(neighbours)), replace = False)]
+
+
+    def sample_unconnected(self, node, k, rng):
+        '''
+        Description: picks k distinct random nodes that are not linked to the node (all of them
+                     if there are fewer than k). When most nodes are unconnected this is done by
+                     rejecting sampled neighbours, otherwise the unconnected nodes are listed.
+        Inputs:
+            - node: node to pick the unconnected nodes of
+            - k: number of nodes to pick
+            - rng: numpy random generator to draw from
+        Outputs:
+            - list of unconnected nodes
+        '''
+        neighbours = self.adj.get(node, ())
+        n_unconnected = len(self.nodes) - len(neighbours) - (node in self.adj)
+        k = min(k, n_unconnected)
+
+        # Dense neighbourhood, so list the few unconnected nodes
+        if n_unconnected < 2 * k:
+            unconnected = [other for other in self.nodes if other != node and other not in neighbours]
+            return [unconnected[idx] for idx in rng.choice(len(unconnected), k, replace = False)]
+
+        # Sparse neighbourhood, so rejection sampling needs few draws (drawn in batches)
+        picked = {}
+        while len(picked) < k:
+            for idx in rng.integers(len(self.nodes), size = 2 * k).tolist():
+                other = self.nodes[idx]
+                if other != node and other not in neighbours:
+                    picked[other] = None
+                    if len(picked) == k:
+                        break
+        return list(picked)
+
+
+class Csr_graph():
+    '''
+    Description: an undirected graph on the nodes 0 to n - 1 that can't change, stored in
+                 compressed sparse row format: the neighbours of node i are
+                 neighbours[offsets[i]:offsets[i + 1]]. Answers the same queries as
+                 Dynamic_graph, with 4 bytes per neighbour instead of Python objects.
+    Inputs:
+        - offsets: start of the neighbours of every node in neighbours, and the total at the end
+        - neighbours: neighbours of all nodes, one node after another
+    Functions:
+        - empty(n_nodes): creates a graph without links
+        - complete(n_nodes): creates a graph with a link between every 2 nodes
+        - from_networkx(graph): creates a Csr_graph with the nodes and edges of a networkx graph
+        - to_networkx(): creates a networkx graph with the same nodes and edges
+        - from_arrays(nodes, offsets, neighbours): creates a Csr_graph from arrays made by to_arrays
+                                                   (of a Csr_graph or a Dynamic_graph)
+        - to_arrays(): returns the nodes and neighbour lists as arrays (e.g. for checkpoints)
+        - neighbours(node): returns a list of the neighbours of a node
+        - has_edge(u, v): checks whether 2 nodes are linked
+        - degree(node): returns the number of neighbours of a node
+        - number_of_edges(): returns the number of links in the graph
+        - edge_array(): returns all links as an (n_edges, 2) array
+        - distances_from(source, cutoff): returns the path lengths from a node to all nodes
+                                          within the cutoff
+        - sample_neighbours(node, k, rng): picks k random neighbours of a node
+        - sample_unconnected(node, k, rng): picks k random nodes that are not linked to a node
+    '''
+
+    name = 'csr'
+    implicit = False
+
+    def __init__(self, offsets, neighbours):
+        self.offsets = np.asarray(offsets, dtype = np.int64)
+        self.neighbours_array = np.asarray(neighbours, dtype = np.int32)
+        self.nodes = range(len(self.offsets) - 1)
+
+
+    @classmethod
+    def empty(cls, n_nodes):
+        return cls(np.zeros(n_nodes + 1), [])
+
+
+    @classmethod
+    def complete(cls, n_nodes):
+        # Every node's neighbours are all nodes except itself
+        neighbours = np.tile(np.arange(n_nodes - 1, dtype = np.int32), n_nodes)
+        neighbours += neighbours >= np.repeat(np.arange(n_nodes, dtype = np.int32), n_nodes - 1)
+        return cls(np.arange(n_nodes + 1) * (n_nodes - 1), neighbours)
+
+
+    @classmethod
+    def from_networkx(cls, graph):
+        edges = np.array(graph.edges, dtype = np.int32).reshape(-1, 2)
+        sources = np.concatenate([edges[:, 0], edges[:, 1]])
+        targets = np.concatenate([edges[:, 1], edges[:, 0]])
+        order = np.argsort(sources, kind = 'stable')
+        offsets = np.zeros(graph.number_of_nodes() + 1, dtype = np.int64)
+        np.cumsum(np.bincount(sources, minlength = graph.number_of_nodes()), out = offsets[1:])
+        return cls(offsets, targets[order])
+
+
+    def to_networkx(self):
+        import networkx as nx
+
+        graph = nx.Graph()
+        graph.add_nodes_from(self.nodes)
+        graph.add_edges_from(self.edge_array().tolist())
+        return graph
+
+
+    @classmethod
+    def from_arrays(cls, nodes, offsets, neighbours):
+        '''
+        Description: creates a Csr_graph from arrays made by to_arrays, keeping the order of the
+                     neighbours of every node. The nodes must be 0 to n - 1, in any order.
+        '''
+        if np.array_equal(nodes, np.arange(len(nodes))):
+            return cls(offsets, neighbours)
+        order = np.argsort(nodes)
+        degrees = np.diff(offsets)[order]
+        new_offsets = np.zeros(len(nodes) + 1, dtype = np.int64)
+        np.cumsum(degrees, out = new_offsets[1:])
+        new_neighbours = np.concatenate([neighbours[offsets[idx]:offsets[idx + 1]] for idx in order] + [np.zeros(0, np.int32)])
+        return cls(new_offsets, new_neighbours)
+
+
+    def to_arrays(self):
+        return np.arange(len(self.nodes), dtype = np.int32), self.offsets, self.neighbours_array
+
+
+    def __getitem__(self, node):
+        return self.neighbours_array[self.offsets[node]:self.offsets[node + 1]]
+
+    def __contains__(self, node):
+        return 0 <= node < len(self.nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+    def neighbours(self, node):
+        return self[node].tolist()
+
+    def has_edge(self, u, v):
+        return u in self and v in self and bool((self[u] == v).any())
+
+    def degree(self, node):
+        return int(self.offsets[node + 1] - self.offsets[node])
+
+    def number_of_edges(self):
+        return len(self.neighbours_array) // 2
+
+
+    def edge_array(self):
+        sources = np.repeat(np.arange(len(self.nodes), dtype = np.int32), np.diff(self.offsets))
+        edges = np.stack([sources, self.neighbours_array], axis = 1)
+        return edges[edges[:, 0] < edges[:, 1]]
+
+
+    def distances_from(self, source, cutoff = None):
+        '''
+        Description: calculates the path lengths from source to all nodes within the cutoff with
+                     a breadth-first search that expands a whole frontier at once. The lengths are
+                     returned as an array with an entry per node instead of a dictionary, which is
+                     faster to fill and smaller whenever more than a few percent of the nodes are
+                     reached.
+        Inputs:
+            - source: node to calculate path lengths from
+            - cutoff: optional, maximum path length (None for no maximum)
+        Outputs:
+            - array with the path length per node (-1 for nodes that are not reached)
+        '''
+        lengths = np.full(len(self.nodes), -1, dtype = np.int8 if cutoff is not None and cutoff < 127 else np.int32)
+        lengths[source] = 0
+        frontier = np.array([source])
+        n_reached = 1
+        depth = 0
+        # Stop as soon as every node is reached, so dense graphs don't gather their edges again
+        while len(frontier) and n_reached < len(self.nodes) and (cutoff is None or depth < cutoff):
+            depth += 1
+
+            # Gather the neighbours of all nodes in the frontier, and mark those not reached before
+            starts = self.offsets[frontier]
+            counts = self.offsets[frontier + 1] - starts
+            positions = np.arange(counts.sum()) + np.repeat(starts - np.cumsum(counts) + counts, counts)
+            neighbours = self.neighbours_array[positions]
+            lengths[neighbours[lengths[neighbours] < 0]] = depth
+            frontier = np.flatnonzero(lengths == depth)
+            n_reached += len(frontier)
+        return lengths
+
+
+    def sample_neighbours(self, node, k, rng):
+        '''
+        Description: picks k distinct random neighbours of a node (all of them if it has
+                     fewer than k neighbours), like Dynamic_graph.sample_neighbours
+        '''
+        neighbours = self[node]
+        return neighbours[rng.choice(len(neighbours), min(k, len(neighbours)), replace = False)].tolist()
+
+
+    def sample_unconnected(self, node, k, rng):
+        '''
+        Description: picks k distinct random nodes that are not linked to the node (all of them
+                     if there are fewer than k), like Dynamic_graph.sample_unconnected
+        '''
+        unconnected = np.ones(len(self.nodes), dtype = bool)
+        unconnected[self[node]] = False
+        unconnected[node] = False
+        unconnected = np.flatnonzero(unconnected)
+        return unconnected[rng.choice(len(unconnected), min(k, len(unconnected)), replace = False)].tolist()
+
+
+class Implicit_graph():
+    '''
+    Description: base of the graphs on the nodes 0 to n - 1 whose links follow from their
+                 structure, so no links are stored and every query is answered analytically.
+                 Memory use is independent of the number of links.
+    Inputs:
+        - n_nodes: number of nodes
+    Functions:
+        - distance(u, v, cutoff): returns the path length between 2 nodes
+        - from_arrays(nodes, offsets, neighbours): creates a graph with the nodes of arrays
+                                                   made by to_arrays (the links are implied)
+        - to_arrays(): returns the nodes and empty neighbour lists as arrays (e.g. for checkpoints)
+        and the queries of Csr_graph
+    '''
+
+    implicit = True
+
+    def __init__(self, n_nodes):
+        self.n_nodes = n_nodes
+        self.nodes = range(n_nodes)
+
+
+    @classmethod
+    def from_arrays(cls, nodes, offsets, neighbours):
+        return cls(len(nodes))
+
+
+    def to_arrays(self):
+        return (np.arange(self.n_nodes, dtype = np.int32), np.zeros(self.n_nodes + 1, dtype = np.int64),
+                np.zeros(0, dtype = np.int32))
+
+
+    def __contains__(self, node):
+        return 0 <= node < self.n_nodes
+
+    def __len__(self):
+        return self.n_nodes
+
+
+class Complete_graph(Implicit_graph):
+    '''
+    Description: an Implicit_graph with a link between every 2 nodes, so every other node is
+                 a neighbour at path length 1.
+    '''
+
+    name = 'complete'
+
+    def to_networkx(self):
+        import networkx as nx
+
+        return nx.complete_graph(self.n_nodes)
+
+
+    def neighbours(self, node):
+        return [other for other in self.nodes if other != node]
+
+    def has_edge(self, u, v):
+        return u != v and u in self and v in self
+
+    def degree(self, node):
+        return self.n_nodes - 1
+
+    def number_of_edges(self):
+        return self.n_nodes * (self.n_nodes - 1) // 2
+
+
+    def edge_array(self):
+        # Lists all n * (n - 1) / 2 links, so results of runs don't store them (see runner.get_results)
+        return np.stack(np.triu_indices(self.n_nodes, 1), axis = 1).astype(np.int32)
+
+
+    def distance(self, u, v, cutoff = None):
+        if u == v:
+            return 0
+        return 1 if cutoff is None or cutoff >= 1 else None
+
+
+    def distances_from(self, source, cutoff = None):
+        if cutoff == 0:
+            return {source : 0}
+        lengths = dict.fromkeys(self.nodes, 1)
+        lengths[source] = 0
+        return lengths
+
+
+    def sample_neighbours(self, node, k, rng):
+        # Same draws as Csr_graph.sample_neighbours on the complete graph
+        picked = rng.choice(self.n_nodes - 1, min(k, self.n_nodes - 1), replace = False)
+        return (picked + (picked >= node)).tolist()
+
+
+    def sample_unconnected(self, node, k, rng):
+        return []
+
+
+class Empty_graph(Implicit_graph):
+    '''
+    Description: an Implicit_graph without links, so no node can reach another.
+    '''
+
+    name = 'empty'
+
+    def to_networkx(self):
+        import networkx as nx
+
+        return nx.empty_graph(self.n_nodes)
+
+
+    def neighbours(self, node):
+        return []
+
+    def has_edge(self, u, v):
+        return False
+
+    def degree(self, node):
+        return 0
+
+    def number_of_edges(self):
+        return 0
+
+
+    def edge_array(self):
+        return np.zeros((0, 2), dtype = np.int32)
+
+
+    def distance(self, u, v, cutoff = None):
+        return 0 if u == v else None
+
+
+    def distances_from(self, source, cutoff = None):
+        return {source : 0}
+
+
+    def sample_neighbours(self, node, k, rng):
+        return []
+
+
+    def sample_unconnected(self, node, k, rng):
+        # Same draws as Csr_graph.sample_unconnected on the empty graph
+        picked = rng.choice(self.n_nodes - 1, min(k, self.n_nodes - 1), replace = False)
+        return (picked + (picked >= node)).tolist()
+
+
+# Networks that have an Implicit_graph
+IMPLICIT_NETWORKS = {'fully_connected' : Complete_graph, 'not_connected' : Empty_graph}
+
+
+def pick_backend(backend, network, dynamic):
+    '''
+    description: decides which graph backend a model uses
+    inputs:
+        - backend: 'csr', 'dynamic', or 'auto' (an implicit graph for the 'fully_connected' and
+                   'not_connected' networks and csr for the others, unless the network changes
+                   over time)
+        - network: network structure of the model
+        - dynamic: whether the network structure changes over time
+    outputs:
+        - 'implicit', 'csr' or 'dynamic'
+    '''
+    if backend == 'csr' and dynamic:
+        raise ValueError("the 'csr' graph backend can't change, so it can't be used for dynamic networks")
+    if backend not in ['csr', 'dynamic', 'auto']:
+        raise ValueError(f"'{backend}' is not a valid graph backend")
+    if backend != 'auto':
+        return backend
+    if dynamic:
+        return 'dynamic'
+    return 'implicit' if network in IMPLICIT_NETWORKS else 'csr'
+
+
+def make_graph(network, n_agents, m_barabasi, prob_link, rng, backend):
+    '''
+    description: creates the social network of a model, on the nodes 0 to n_agents - 1
+    inputs:
+        - network: network structure ('fully_connected', 'holme_kim', 'homophily' or 'not_connected')
+        - n_agents: number of agents in the model
+        - m_barabasi: number of links of every new node of the Holme-Kim network
+        - prob_link: triad formation probability of the Holme-Kim network
+        - rng: numpy random generator to draw the seed of the Holme-Kim network from
+        - backend: graph backend from pick_backend
+    outputs:
+        - graph object (an empty Dynamic_graph for 'homophily', which the model links while
+          adding its agents)
+    '''
+    if backend == 'implicit':
+        return IMPLICIT_NETWORKS[network](n_agents)
+
+    if network == 'fully_connected':
+        graph = Csr_graph.complete(n_agents)
+    elif network == 'holme_kim':
+        import networkx as nx
+
+        graph = Csr_graph.from_networkx(nx.powerlaw_cluster_graph(n = n_agents, m = m_barabasi, p = prob_link,
+                                                                  seed = int(rng.integers(2**32))))
+    elif network == 'homophily':
+        return Dynamic_graph()
+    elif network == 'not_connected':
+        graph = Csr_graph.empty(n_agents)
+    else:
+        raise Exception(f"'{network}' is not a valid model structure")
+
+    return graph if backend == 'csr' else Dynamic_graph.from_arrays(*graph.to_arrays())
+
+
+def results_graph(backend, n_agents, edges):
+    '''
+    description: creates a networkx graph of the social network stored in the results of a run
+    inputs:
+        - backend: name of the graph class of the run
+        - n_agents: number of agents in the run
+        - edges: stored links of the run (none for implicit graphs)
+    outputs:
+        - networkx graph
+    '''
+    if backend in [Complete_graph.name, Empty_graph.name]:
+        return GRAPH_BACKENDS[backend](n_agents).to_networkx()
+
+    import networkx as nx
+
+    graph = nx.Graph()
+    graph.add_nodes_from(range(n_agents))
+    graph.add_edges_from(edges.tolist())
+    return graph
+
+
+# Graph classes by name, to restore the right one from a checkpoint
+GRAPH_BACKENDS = {backend.name : backend for backend in [Dynamic_graph, Csr_graph, Complete_graph, Empty_graph]}
@@ -6,75 +6,95 @@
 ####
 
 # Internal imports
-from party import Party_model
-from utils import make_path, get_config
+from utils import get_config
 
 # External imports
-from mesa.batchrunner import BatchRunner
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from agents import Member
-from warnings import filterwarnings
-
-
-# Prevent mesa's deprecation warnings that can't really be solved since the new version is 
-# buggy and has very poor documentation.
-filterwarnings("ignore") 
-
-# Import parameter configuration from file based on input argument (default: configs.normal)
-params = get_config()
-replicates = params.n_runs
-max_steps = params.n_iterations
-distinct_samples = params.n_distinct_samples
-problem = params.problem
-
-# Set the outputs
-model_reporters = {"voters": lambda m: m.get_voters()}
-
-data = pd.DataFrame()
-for idx, var in enumerate(problem['names']):
-    print(f'varying {var}')
-    
-    # Generate uniform samples within the bounds
-    samples = np.linspace(*problem['bounds'][idx], num = distinct_samples)
-    
-    # Run Model for all parameter values
-    batch = BatchRunner(Party_model, 
-                        max_steps = max_steps,
-                        iterations = replicates,
-                        variable_parameters = {var : samples},
-                        model_reporters = model_reporters)    
-    batch.run_all()
-    
-    # Save results
-    var_data = batch.get_model_vars_dataframe().rename(columns = {var : 'val'})
-    var_data['var'] = var
-    data = pd.concat([data, var_data])
+from argparse import ArgumentParser
+
+
+def add_arguments(parser):
+    '''
+    description: adds the command line arguments of ofat.py to a parser
+    inputs:
+        - parser: argparse parser (or subcommand parser of cli.py)
+    '''
+    parser.add_argument('config', nargs = '?', default = 'normal', help = 'name of the config file in configs/')
+    parser.add_argument('--workers', type = int, default = 1, help = 'number of processes to run samples in')
+    parser.add_argument('--chunk-size', type = int, default = 1, help = 'number of runs per task sent to a worker')
+
 
-# Write results to file
-path = make_path('sensitivity_analysis')
-data.to_csv(f'{path}ofat.csv')
+def main(args):
+    '''
+    description: runs the local sensitivity analysis, and saves its results and plots
+    inputs:
+        - args: parsed command line arguments (see add_arguments)
+    '''
+    # The simulation and plotting libraries are only imported once there is something to do
+    from runner import replicate_points
+    from utils import make_path, make_seed
+    from instruments import add_totals, save_totals
+    import pandas as pd
+    import numpy as np
+    import matplotlib.pyplot as plt
 
+    # Import parameter configuration from file (configs/normal.py by default)
+    params = get_config(args.config)
+    distinct_samples = params.n_distinct_samples
+    problem = params.problem
 
-## visualize results
+    # Enumerate all samples up front: every uniform sample within the bounds of every
+    # parameter, while the other parameters keep their value from the config
+    samples = [(idx, var, val_idx, val)
+               for idx, var in enumerate(problem['names'])
+               for val_idx, val in enumerate(np.linspace(*problem['bounds'][idx], num = distinct_samples))]
+    points = [{var : val} for idx, var, val_idx, val in samples]
+    seed = lambda sample, run : make_seed(params.seed, samples[sample][0], samples[sample][2], run)
 
-# Set location
-result_path = make_path('sensitivity_analysis')
+    # Run replicates of the model for all samples (adding replicates until the mean voters are
+    # precise enough if params.adaptive_runs is set), and write the results to file as they come in
+    path = make_path('sensitivity_analysis')
+    with open(f'{path}ofat.csv', 'w') as file:
+        file.write('val,Run,voters,var\n')
+        done = 0
+        totals = {}
+        for chunk, runs, voters, chunk_totals in replicate_points(params, params.networks[0], points, seed, args.workers, args.chunk_size):
+            add_totals(totals, chunk_totals)
+            for sample, run, voter in zip(chunk, runs, voters):
+                idx, var, val_idx, val = samples[sample]
+                file.write(f'{val},{run},{voter},{var}\n')
+            file.flush()
+            done += len(chunk)
+            print(f'run {done}', end = '\r', flush = True)
 
-# Plot voters per value for changing parameters
-fig, axs = plt.subplots(4, sharex = False, figsize = (7, 10))
-fig.tight_layout()
+    data = pd.read_csv(f'{path}ofat.csv')
+    if params.instrument:
+        save_totals(totals, f'{path}ofat_instruments.json')
 
-# Subplot per variable tested for sensitivity
-for idx, var in enumerate(problem['names']):
-    var_data = data[data['var'] == var].drop(columns = ['Run']).groupby('val').agg(['mean', 'std']).reset_index()
-    var_data['err'] = (1.96 * var_data['voters']['std']) / np.sqrt(replicates)
+
+    ## visualize results
+
+    # Set location
+    result_path = make_path('sensitivity_analysis')
+
+    # Plot voters per value for changing parameters
+    fig, axs = plt.subplots(4, sharex = False, figsize = (7, 10))
+    fig.tight_layout()
+
+    # Subplot per variable tested for sensitivity
+    for idx, var in enumerate(problem['names']):
+        var_data = data[data['var'] == var].drop(columns = ['Run', 'var']).groupby('val').agg(['mean', 'std', 'count']).reset_index()
+        var_data['err'] = (1.96 * var_data['voters']['std']) / np.sqrt(var_data['voters']['count'])
     
-    axs[idx].plot(var_data['val'].values, var_data['voters']['mean'].values, c = 'k')
-    axs[idx].fill_between(var_data['val'].values, var_data['voters']['mean'] - var_data['err'], var_data['voters']['mean'] + var_data['err'])
+        axs[idx].plot(var_data['val'].values, var_data['voters']['mean'].values, c = 'k')
+        axs[idx].fill_between(var_data['val'].values, var_data['voters']['mean'] - var_data['err'], var_data['voters']['mean'] + var_data['err'])
+
+        axs[idx].set_xlabel(var)
+        axs[idx].set_ylabel('voters')
+
+    plt.savefig(f"{result_path}ofat.png")
 
-    axs[idx].set_xlabel(var)
-    axs[idx].set_ylabel('voters')
 
-plt.savefig(f"{result_path}ofat.png")
\ No newline at end of file
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'Runs local sensitivity analysis on the first network in the config.')
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -8,14 +8,25 @@
 # Internal imports
 from utils import get_config, set_valid
 from agents import Member
+from paths import Path_index
+from distances import Trait_distances
+from network import Csr_graph, make_graph, pick_backend
+from recorder import Recorder
+from instruments import Instruments, No_instruments
+from convergence import Steady_state
+from vectorized import CHARACTERISTICS, draw_thresholds, pp_scores, cascade_pp
 
 # External imports
 import numpy as np
 import random
+from operator import attrgetter
 from mesa import Agent, Model, time
-from mesa.datacollection import DataCollector
-import networkx as nx
-from scipy.stats import truncnorm
+
+
+# Reads the state update_pp needs from a Member in one call
+MEMBER_STATE = [*CHARACTERISTICS, 'ses', 'contacts', 'time_in_community', 'vote_duty', 'until_eligible']
+pp_state = attrgetter(*MEMBER_STATE)
+trait_state = attrgetter('social', 'autonomous', 'approaching', 'ses')
 
 
 class Party_model(Model):
@@ -29,12 +40,22 @@ class Party_model(Model):
         - network: which network structure to initialize the social network of agents with
         - params: parameters imported from config/[name].py
         - dynamic: whether the network structure changes over time
+        - instrument: optional, whether to time the phases of each step and count hot-path events
+        - seed: optional, seed (or numpy SeedSequence) of the model's random number generator,
+                which all random draws of the model and its agents go through
     Functions:
         - add_agent(agent): adds an agent to the model
         - init_agents(): initialize all agents of the model 
                          (must be done in the model for mesa's sensitivity analysis)
         - step(): updates model environment and takes a step for each agent
         - get_voters(): returns the number of voters in the model (#agents where agent.pps >= 2)
+        - get_pps(): returns the political participation of all agents
+        - draw_step(): draws the random numbers all agents need for a step at once
+        - update_pp(): updates the political participation of all agents at once (batched mode)
+        - get_agent_state(): returns the state of all agents as arrays (e.g. for checkpoints)
+        - set_agent_state(state): sets the state of all agents from arrays made by get_agent_state
+        - get_traits(agents): returns the traits that distances between agents are based on
+        - fermi_dirac(agent, partners): returns the probabilities of an agent being linked to others
     '''
 
     def __init__(self,
@@ -44,7 +65,9 @@ class Party_model(Model):
                  prob_link = None,              
                  dynamic = False,
                  network = None,
-                 params = None):
+                 params = None,
+                 instrument = None,
+                 seed = None):
         
         # Handle Initializing when not provided
         if params is None:
@@ -59,6 +82,8 @@ class Party_model(Model):
             prob_link = params.prob_link
         if network is None:
             network = params.networks[0]
+        if instrument is None:
+            instrument = params.instrument
         
         # Initialize probabilities and check whether they are in range [0,1]
         self.prob_stimulus = set_valid(prob_stimulus, 
@@ -87,45 +112,54 @@ class Party_model(Model):
         self.fermi_b = params.fermi_b
         self.network = network
         self.dynamic = dynamic
+        self.batched_pp = params.batched_pp
         
+        # Initialize random number generators, where mesa's is used by the scheduler
+        self.rng = np.random.default_rng(seed)
+        self.random = random.Random(int(self.rng.integers(2**63)))
+
         # Initialize standard parameters
         self.schedule = time.RandomActivation(self)
         self.time = 0
-        self.agents = np.array([])
+        self.agents = np.empty(self.n_agents, dtype = object)
         self.stimulus = False
         self.running = True
-        self.datacollector = DataCollector(model_reporters = {"voters" : lambda m : self.get_voters()},
-                                           agent_reporters = {"political participation" : "pps"})
-
-        # Create graph
-        if network == 'fully_connected':
-            self.graph = nx.complete_graph(n = self.n_agents)
-        elif network == 'holme_kim':
-            self.graph = nx.powerlaw_cluster_graph(n = self.n_agents, m = params.m_barabasi, p = prob_link)
-        elif network in ['homophily', 'not_connected']:
-            self.graph = nx.Graph()
-        else:
-            raise Exception(f"'{network}' is not a valid model structure")
-
-        # Initialize agents and do first datacollection
+        self.instruments = Instruments() if instrument else No_instruments()
+        self.datacollector = Recorder(self.n_agents, params.n_iterations, params.record_stride)
+        self.steady_state = Steady_state(params.post_burn_in, params.stationary_tolerance, params.steady_check_every) if params.steady_state else None
+
+        # Create graph (nodes are the agents' unique ids), index of path lengths in the graph and distances between traits.
+        # Networks that don't change are stored as compact Csr_graphs, or without links if implicit
+        self.paths = Path_index(self, params.path_cutoff)
+        self.trait_distances = Trait_distances(self)
+        backend = pick_backend(params.graph_backend, network, dynamic)
+        self.graph = make_graph(network, self.n_agents, params.m_barabasi, prob_link, self.rng, backend)
+
+        # Initialize agents and do first datacollection (step 0 of the instruments)
         self.init_agents(params.char_distr)
+        if backend == 'csr' and network == 'homophily':
+            self.graph = Csr_graph.from_arrays(*self.graph.to_arrays())
+            self.paths.clear()
         self.datacollector.collect(self)
+        self.instruments.end_step()
+
+        # The matrix of all distances between agents can only be kept once all agents exist
+        self.trait_distances = Trait_distances(self, params.distance_cache)
 
     def add_agent(self, agent):
         '''
-        Description: adds agent to the model and graph
+        Description: adds agent to the model and graph. Nodes of the graph are the agents'
+                     unique ids, which index into self.agents.
         Input:
             - agent: Agent object to add
         '''
 
-        self.agents = np.append(self.agents, agent)
+        self.agents[agent.unique_id] = agent
         self.schedule.add(agent)
 
-        # Attach agent to node in graph
-        if self.network in ['homophily', 'not_connected']:
-            self.graph.add_node(agent)
-        else:
-            self.graph = nx.relabel_nodes(self.graph, {agent.unique_id: agent})
+        # Premade networks already have a node for every agent
+        if agent.unique_id not in self.graph:
+            self.graph.add_node(agent.unique_id)
 
     def init_agents(self, char_distr):
         '''
@@ -138,44 +172,165 @@ class Party_model(Model):
 
         # Generate agent characteristics:
         if char_distr == 'normal': # Truncated normal distribution, to stay within limits
+            from scipy.stats import truncnorm
+
             mu = 2
             distr = truncnorm(-mu, mu, loc = mu, scale = 1)
-            samples = distr.rvs(self.n_agents * 8)
+            samples = distr.rvs(self.n_agents * 8, random_state = self.rng)
             characteristics = np.reshape(samples, (self.n_agents, 8))
         elif char_distr == 'uniform': # Uniform distribution within limits
-            characteristics = np.random.uniform(1, 5, (self.n_agents, 8))
+            characteristics = self.rng.uniform(1, 5, (self.n_agents, 8))
+        moved = self.rng.uniform(0, 1, self.n_agents) <= self.prob_move
+        vote_duty = self.rng.uniform(0, 1, self.n_agents) < .03
+        ses = self.rng.integers(1, 4, self.n_agents)
 
-        # Intialize each agent
+        # Random numbers for the agents' first update of political participation
+        self.draw_step()
+
+        # Intialize each agent (with Python floats, which are faster to calculate with than numpy's)
+        characteristics = characteristics.tolist()
         for idx in range(self.n_agents):
             agent = Member(idx,
                            self,
-                           until_eligible = 0 if random.uniform(0, 1) > self.prob_move else self.until_eligible,
-                           vote_duty = random.uniform(0, 1) < .03,
-                           active = characteristics[idx, 0],
-                           overt = characteristics[idx, 1],
-                           autonomous = characteristics[idx, 2],
-                           approaching = characteristics[idx, 3],
-                           continuous = characteristics[idx, 4],
-                           outtaking = characteristics[idx, 5],
-                           expressive = characteristics[idx, 6],
-                           social = characteristics[idx, 7],
-                           ses = random.randint(1, 3))
+                           until_eligible = self.until_eligible if moved[idx] else 0,
+                           vote_duty = bool(vote_duty[idx]),
+                           active = characteristics[idx][0],
+                           overt = characteristics[idx][1],
+                           autonomous = characteristics[idx][2],
+                           approaching = characteristics[idx][3],
+                           continuous = characteristics[idx][4],
+                           outtaking = characteristics[idx][5],
+                           expressive = characteristics[idx][6],
+                           social = characteristics[idx][7],
+                           ses = int(ses[idx]))
             
             # Add agent to model
             self.add_agent(agent)
 
+        if self.batched_pp:
+            self.update_pp()
+
 
     def step(self):
         '''
         Description: updates environment and takes a step for each agent
         '''
         
-        # Check whether stimulus happens for all agents
-        self.stimulus = random.uniform(0, 1) < self.prob_stimulus
+        # Check whether stimulus happens for all agents, and draw the agents' random numbers
+        self.stimulus = self.rng.uniform(0, 1) < self.prob_stimulus
+        self.draw_step()
+
+        if self.stimulus:
+            self.instruments.count('stimulus_ticks')
 
         # Let mesa handle all agent steps and datacollection
         self.schedule.step()
-        self.datacollector.collect(self)
+        if self.batched_pp:
+            with self.instruments.phase('update_pp'):
+                self.update_pp()
+        with self.instruments.phase('collect'):
+            self.datacollector.collect(self)
+        self.instruments.end_step()
+
+        # Stop once the voters have been in steady state for long enough
+        recorder = self.datacollector
+        if self.steady_state is not None and self.steady_state.update(self.schedule.steps, recorder.steps, recorder.voters):
+            self.running = False
+
+
+    def draw_step(self):
+        '''
+        Description: draws the random numbers every agent needs for a step in batches, instead of
+                     each agent drawing them separately: whether it interacts, whether it moves, its
+                     base political participation, the thresholds of each political participation
+                     level, the numbers of its interaction, and how a stimulus (if any) changes its
+                     characteristics. Agents read these by their unique_id.
+        '''
+        self.interact_draws, self.move_draws, self.pp_draws = self.rng.uniform(0, 1, (3, self.n_agents))
+        self.thresholds = draw_thresholds(self.rng, self.n_agents)
+
+        # The numbers of an interaction (see Member.interact), and a 0 or 1 per affected characteristic
+        # of a stimulus, of which only those of agents that interact or are stimulated are used
+        self.interaction_draws = self.rng.uniform(0, 1, (self.n_agents, 6))
+        if self.stimulus:
+            self.stimulus_draws = self.rng.integers(0, 2, (self.n_agents, len(self.characteristics_affected)))
+
+        # A number per considered link to add and to remove, when links change (homophily networks
+        # are also made by changing links, while the agents are created before the first step)
+        if self.dynamic or (self.network == 'homophily' and self.schedule.steps == 0):
+            self.link_draws = self.rng.uniform(0, 1, (self.n_agents, 2, self.edges_per_step))
+
+
+    def update_pp(self):
+        '''
+        Description: updates the political participation of all agents at once, evaluating the
+                     cascade of Member.update_pp as array operations with the thresholds from
+                     draw_step, and writes the result back to the agents
+        '''
+        state = np.array([pp_state(agent) for agent in self.agents], dtype = float)
+        chars, ses, contacts, time_in_community, vote_duty, until_eligible = np.split(state, [8, 9, 10, 11, 12], axis = 1)
+        scores = pp_scores(chars, ses[:, 0], contacts[:, 0], time_in_community[:, 0])
+        pps = cascade_pp(scores, self.thresholds, (self.pp_draws <= .1).astype(int),
+                         vote_duty[:, 0] > 0, until_eligible[:, 0] == 0)
+
+        for agent, pp in zip(self.agents, pps.tolist()):
+            agent.pps = pp
+
+
+    def get_agent_state(self):
+        '''
+        Description: collects the state of all agents that changes over time
+        Outputs:
+            - dictionary with an array per state variable, ordered by unique_id
+        '''
+        state = np.array([pp_state(agent) for agent in self.agents], dtype = float)
+        return {'chars' : state[:, :8],
+                'ses' : state[:, 8].astype(int),
+                'contacts' : state[:, 9].astype(int),
+                'time_in_community' : state[:, 10].astype(int),
+                'vote_duty' : state[:, 11] > 0,
+                'until_eligible' : state[:, 12].astype(int),
+                'pps' : self.get_pps()}
+
+
+    def set_agent_state(self, state):
+        '''
+        Description: sets the state of all agents
+        Inputs:
+            - state: dictionary with an array per state variable, made by get_agent_state
+        '''
+        names = MEMBER_STATE + ['pps']
+        columns = [*state['chars'].T.tolist(), *(state[name].tolist() for name in names[8:])]
+        for agent, values in zip(self.agents, zip(*columns)):
+            for name, value in zip(names, values):
+                setattr(agent, name, value)
+        self.trait_distances.changed()
+
+
+    def get_traits(self, agents = None):
+        '''
+        Description: collects the traits that distances between agents are based on
+        Inputs:
+            - agents: optional, unique_ids of the agents to collect the traits of (None for all agents)
+        Outputs:
+            - array with the social, autonomous, approaching and ses of each agent
+        '''
+        agents = self.agents if agents is None else self.agents[agents]
+        return np.array([trait_state(agent) for agent in agents], dtype = float).reshape(-1, 4)
+
+
+    def fermi_dirac(self, agent, partners):
+        '''
+        Description: calculates the (Fermi Dirac) probability of an agent being connected to
+                     each of its potential partners, based on the distances between their traits
+        Inputs:
+            - agent: unique_id of the agent to consider connections of
+            - partners: unique_ids of the agents to consider connecting to
+        Outputs:
+            - probability per partner
+        '''
+        distance = self.trait_distances.between(agent, partners)
+        return 1 / (1 + np.exp(self.fermi_alpha * (distance - self.fermi_b)))
 
 
     def get_voters(self):
@@ -185,3 +340,12 @@ class Party_model(Model):
             - number of voters (number of agents in the model where agent.pps >= 2)
         '''
         return len([True for agent in self.agents if agent.pps >= 2])
+
+
+    def get_pps(self):
+        '''
+        Description: collects the political participation of all agents
+        Outputs:
+            - array with the political participation per agent, ordered by unique_id
+        '''
+        return np.fromiter((agent.pps for agent in self.agents), dtype = np.int8, count = self.n_agents)
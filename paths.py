@@ -0,0 +1,101 @@
+###### paths.py
+# Specifies the Path_index class, which stores the hop distances between agents in
+# the social network so that interactions don't need a breadth-first search of the
+# graph each time. Distances are only stored up to a cutoff, beyond which the
+# (Fermi-Dirac) probability of an interaction being accepted is negligible.
+####
+
+
+class Path_index():
+    '''
+    Description: a Path_index stores the shortest path lengths (in hops) between nodes of
+                 the model's graph. Each node's distances are calculated once, the first time
+                 they are needed, and are only recalculated when an edge close to that node
+                 is added or removed.
+    Inputs:
+        - model: model object whose graph is indexed (model.graph may be replaced, as long
+                 as no distances have been requested yet)
+        - cutoff: optional, maximum path length to store (None to store all path lengths)
+    Functions:
+        - path_length(source, target): returns the path length between 2 nodes
+        - lengths_from(source): returns the path lengths from a node to all nodes within the cutoff
+        - edge_changed(u, v): updates the index for an edge that is about to be added or removed
+        - clear(): removes all stored path lengths
+    '''
+
+    def __init__(self, model, cutoff = None):
+        self.model = model
+        self.cutoff = cutoff
+        self.lengths = {}
+
+
+    def lengths_from(self, source):
+        '''
+        Description: returns the path lengths from source to all nodes within the cutoff,
+                     calculated with a breadth-first search of the graph if they are not stored yet.
+        Inputs:
+            - source: node to calculate path lengths from
+        Outputs:
+            - path lengths from the graph's distances_from: a dictionary with the path length per
+              reachable node, or an array with the path length per node (-1 if not reachable)
+        '''
+        if source in self.lengths:
+            return self.lengths[source]
+
+        lengths = self.model.graph.distances_from(source, self.cutoff)
+        self.lengths[source] = lengths
+        return lengths
+
+
+    def path_length(self, source, target):
+        '''
+        Description: returns the shortest path length between source and target
+        Inputs:
+            - source: node at the start of the path
+            - target: node at the end of the path
+        Outputs:
+            - path length, or None if there is no path within the cutoff
+        '''
+        # Implicit graphs know their path lengths without a search
+        if self.model.graph.implicit:
+            return self.model.graph.distance(source, target, self.cutoff)
+
+        if target in self.lengths and source not in self.lengths:
+            source, target = target, source
+        lengths = self.lengths_from(source)
+        if isinstance(lengths, dict):
+            return lengths.get(target)
+        length = int(lengths[target])
+        return None if length < 0 else length
+
+
+    def edge_changed(self, u, v):
+        '''
+        Description: removes the stored path lengths that can be affected by adding or removing
+                     the edge between u and v. Must be called before the graph is changed. Any
+                     path that uses the edge starts within the cutoff of u or v, so only those
+                     nodes have to be recalculated.
+        Inputs:
+            - u: first node of the edge
+            - v: second node of the edge
+        '''
+        if not self.lengths:
+            return
+
+        # Use the stored lengths of the endpoints, or find the stored nodes that reach them
+        affected = set()
+        for endpoint in [u, v]:
+            if endpoint in self.lengths:
+                affected.update(self.lengths[endpoint])
+            else:
+                affected.update(node for node, lengths in self.lengths.items() if endpoint in lengths)
+
+        for node in affected:
+            self.lengths.pop(node, None)
+
+
+    def clear(self):
+        '''
+        Description: removes all stored path lengths (needed when the graph is replaced)
+        '''
+        self.lengths = {}
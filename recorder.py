@@ -0,0 +1,114 @@
+###### recorder.py
+# Specifies the Recorder class, which collects the political participation of all
+# agents and the number of voters into preallocated numpy arrays. It replaces
+# mesa's DataCollector, which stores a tuple per agent per step, and only creates
+# pandas dataframes when they are asked for.
+####
+
+# External imports
+import numpy as np
+
+
+class Recorder():
+    '''
+    Description: a Recorder stores the political participation of every agent and the number
+                 of voters every stride steps, in arrays that are filled in place and grow
+                 when the model runs for more steps than expected.
+    Inputs:
+        - n_agents: number of agents in the model
+        - n_steps: expected number of steps the model runs for (excluding initialization)
+        - stride: optional, number of steps between recordings
+    Functions:
+        - collect(model): records the current state of the model (if the step is recorded)
+        - restore(steps, voters, pps, step): continues recording after earlier recordings
+        - get_model_vars_dataframe(): returns a dataframe with the voters per recorded step
+        - get_agent_vars_dataframe(): returns a dataframe with political participation per
+                                      agent per recorded step, like mesa's DataCollector
+    Attributes:
+        - steps: recorded steps
+        - voters: number of voters per recorded step
+        - pps: (recorded steps, n_agents) array of political participation
+    '''
+
+    def __init__(self, n_agents, n_steps, stride = 1):
+        self.n_agents = n_agents
+        self.stride = stride
+        self.step = 0
+        self.n_rows = 0
+
+        capacity = n_steps // stride + 1
+        self._steps = np.zeros(capacity, dtype = np.int32)
+        self._voters = np.zeros(capacity, dtype = np.int32)
+        self._pps = np.zeros((capacity, n_agents), dtype = np.int8)
+
+
+    @property
+    def steps(self):
+        return self._steps[:self.n_rows]
+
+    @property
+    def voters(self):
+        return self._voters[:self.n_rows]
+
+    @property
+    def pps(self):
+        return self._pps[:self.n_rows]
+
+
+    def collect(self, model):
+        '''
+        Description: records the political participation of all agents and the number of voters,
+                     if the current step is a multiple of the stride. Must be called once per step.
+        Inputs:
+            - model: model to record, which must have a get_pps() function
+        '''
+        step = self.step
+        self.step += 1
+        if step % self.stride:
+            return
+
+        # Double the capacity when the model runs longer than expected
+        if self.n_rows == len(self._steps):
+            self._steps = np.concatenate([self._steps, np.zeros_like(self._steps)])
+            self._voters = np.concatenate([self._voters, np.zeros_like(self._voters)])
+            self._pps = np.concatenate([self._pps, np.zeros_like(self._pps)])
+
+        row = self._pps[self.n_rows]
+        row[:] = model.get_pps()
+        self._steps[self.n_rows] = step
+        self._voters[self.n_rows] = np.count_nonzero(row >= 2)
+        self.n_rows += 1
+
+
+    def restore(self, steps, voters, pps, step):
+        '''
+        Description: replaces the recordings with earlier ones (e.g. from a checkpoint), so
+                     recording continues after them
+        Inputs:
+            - steps: recorded steps
+            - voters: number of voters per recorded step
+            - pps: political participation per recorded step and agent
+            - step: number of times collect was called for the recordings
+        '''
+        self.step = int(step)
+        self.n_rows = len(steps)
+        capacity = max(len(self._steps), self.n_rows)
+        self._steps = np.zeros(capacity, dtype = np.int32)
+        self._voters = np.zeros(capacity, dtype = np.int32)
+        self._pps = np.zeros((capacity, self.n_agents), dtype = np.int8)
+        self._steps[:self.n_rows] = steps
+        self._voters[:self.n_rows] = voters
+        self._pps[:self.n_rows] = pps
+
+
+    def get_model_vars_dataframe(self):
+        import pandas as pd
+
+        return pd.DataFrame({'voters' : self.voters}, index = pd.Index(self.steps, name = 'Step'))
+
+
+    def get_agent_vars_dataframe(self):
+        import pandas as pd
+
+        index = pd.MultiIndex.from_product([self.steps, range(self.n_agents)], names = ['Step', 'AgentID'])
+        return pd.DataFrame({'political participation' : self.pps.ravel()}, index = index)
@@ -4,128 +4,183 @@
 ####
 
 # Internal imports
-from party import Party_model
-from agents import Member
-from utils import safe_run_data, make_path, get_config, get_category
+from utils import get_config
 
 # External imports
-import matplotlib.pyplot as plt
-import networkx as nx
-import seaborn as sns
-import pandas as pd
-
-
-# Import parameter configuration from file based on input argument 
-# (default: configs.normal)
-params = get_config()
-
-# Run model with each network structure
-for network in params.networks:
-    print(f"simulating a {network.replace('_', ' ')} network")
-
-    # Initialize data
-    agent_data = pd.DataFrame()
-    model_data = pd.DataFrame()
-    
-    # Perform independent runs of the model
-    for run in range(params.n_runs):
-        print(f'run {run + 1} / {params.n_runs}', end = '\r', flush = True)
-        
-        # Create model
-        model = Party_model(prob_stimulus = params.prob_stimulus,
-                            prob_interaction = params.prob_interaction,
-                            prob_move = params.prob_move,
-                            prob_link = params.prob_link,
-                            params = params,
-                            network = network)
-
-        # Run model
-        for iteration in range(params.n_iterations):
-            model.step()
-
-        # Save results
-        agent_data = safe_run_data(agent_data, model.datacollector.get_agent_vars_dataframe(), run)
-        model_data = safe_run_data(model_data, model.datacollector.get_model_vars_dataframe(), run)
-        
-    
-    ## Visualize results
-    print('saving results ...', end = '\r', flush = True)
-
-    # Set location
-    result_path = make_path(network)
-
-    # Plots network structure
-    nx.draw(model.graph, node_size = 10)
-    plt.savefig(f"{result_path}network_{model.network}.png")
-    plt.clf()
-
-    # Plot the number of voters over time
-    sns.lineplot(data = model_data,
-                 x = 'Step',
-                 y = 'voters',
-                 errorbar = 'sd')
-    plt.ylim(0, 100)
-    plt.savefig(f"{result_path}{model.network}_voters.png")
-    plt.clf()
-
-    # Plot the mean political participation over time
-    sns.lineplot(data = agent_data,
-                 x = 'Step',
-                 y = 'political participation',
-                 errorbar = 'sd')
-    plt.ylim(0,12)
-    plt.savefig(f"{result_path}{model.network}_mean_pp.png")
-    plt.clf()
-
-    # Plot number of agents with certain level of political participation over time
-    for pp in range(13):
-        sns.lineplot(data = agent_data[agent_data["political participation"] == pp].groupby(['Step', 'run']).count(),
+from argparse import ArgumentParser
+
+
+def add_arguments(parser):
+    '''
+    description: adds the command line arguments of run.py to a parser
+    inputs:
+        - parser: argparse parser (or subcommand parser of cli.py)
+    '''
+    parser.add_argument('config', nargs = '?', default = 'normal', help = 'name of the config file in configs/')
+    parser.add_argument('--workers', type = int, default = 1, help = 'number of processes to run replicates in')
+    parser.add_argument('--resume', action = 'store_true',
+                        help = 'skip runs that are already saved, and continue the others from their last checkpoint')
+
+
+def main(args):
+    '''
+    description: runs the model for all network types in the config, and saves plots, graphs
+                 and a summary of the results of every network
+    inputs:
+        - args: parsed command line arguments (see add_arguments)
+    '''
+    # The simulation and plotting libraries are only imported once there is something to do
+    from runner import run_replicates, run_inputs, model_frame, pp_counts, count_frame, PP_LEVELS, CATEGORIES
+    from store import Run_store
+    from summary import Summary_store
+    from network import results_graph
+    from instruments import add_totals, save_totals
+    from utils import make_path, get_category
+    import matplotlib.pyplot as plt
+    import networkx as nx
+    import seaborn as sns
+    import pandas as pd
+    import numpy as np
+
+    # Import parameter configuration from file (configs/normal.py by default)
+    params = get_config(args.config)
+
+    # Perform independent runs of the model with each network structure, saving the
+    # results of each run to disk as soon as it is done (after which its checkpoint
+    # is no longer needed)
+    print(f"simulating {len(params.networks)} network(s) with {args.workers} worker(s)")
+    store = Run_store()
+    checkpoints = Run_store('checkpoints')
+
+    def saved(network, run):
+        # Runs saved with another config, network or seed are done again
+        return store.exists(network, run) and 'inputs' in store.fields(network, run) \
+               and store.load(network, run, 'inputs').item() == run_inputs(params, network, run)
+    todo = {network : [run for run in range(params.n_runs) if not (args.resume and saved(network, run))]
+            for network in params.networks}
+    n_tasks = sum(len(runs) for runs in todo.values())
+    for done, (network, run, results) in enumerate(run_replicates(params, params.networks, args.workers, todo, args.resume)):
+        store.write(network, run, results)
+        checkpoints.remove(network, run)
+        print(f'run {done + 1} / {n_tasks}', end = '\r', flush = True)
+
+    for network in params.networks:
+        print(f"saving results of the {network.replace('_', ' ')} network")
+
+        # Read back the results of all runs of this network, counting the agents per level of
+        # political participation per run and step in one pass, so all plots and the summary
+        # read from the counts instead of a row per agent
+        runs = range(params.n_runs)
+        last_run = runs[-1]
+        model_data = pd.concat([model_frame(store.load(network, run, 'steps'), voters, run)
+                                for run, voters in store.iter_field(network, runs, 'voters')], ignore_index = True)
+        count_data = pd.concat([count_frame(store.load(network, run, 'steps'), pp_counts(pps), run)
+                                for run, pps in store.iter_field(network, runs, 'pps')], ignore_index = True)
+        levels = [f'pp_{pp}' for pp in range(PP_LEVELS)]
+
+        # Align the ends of the runs, which differ when runs stop after their burn-in
+        for data in [model_data, count_data]:
+            data['steps_left'] = data.groupby('run')['Step'].transform('max') - data['Step']
+
+        ## Visualize results
+        print('saving results ...', end = '\r', flush = True)
+
+        # Set location
+        result_path = make_path(network)
+
+        # Save the total time per phase and count per counter over all runs
+        if params.instrument:
+            totals = {}
+            for run in runs:
+                instrumented = [field for field in store.fields(network, run) if field.startswith(('time_', 'count_'))]
+                add_totals(totals, {field : store.load(network, run, field).sum().item() for field in instrumented})
+            save_totals(totals, f'{result_path}instruments.json')
+
+        # Plots network structure (of the last run)
+        # Implicit graphs store no links, results cached without the name of their graph class always do
+        backend = store.load(network, last_run, 'graph').item() if 'graph' in store.fields(network, last_run) else None
+        graph = results_graph(backend, params.n_agents, store.load(network, last_run, 'edges'))
+        nx.draw(graph, node_size = 10)
+        plt.savefig(f"{result_path}network_{network}.png")
+        plt.clf()
+
+        # Plot the number of voters over time
+        sns.lineplot(data = model_data,
                      x = 'Step',
-                     y = 'political participation',
-                     errorbar = 'sd',
-                     label = pp)
-    plt.ylabel('count')
-    plt.legend()
-    plt.savefig(f"{result_path}{model.network}_agents_per_pp.png")
-    plt.clf()
-
-    # Plot number of agents within certain ranges of political participation over time
-    pps_aggr = [ agent_data["political participation"] == 0,
-                 (agent_data["political participation"] > 0) & (agent_data["political participation"] < 5),
-                 (agent_data["political participation"] >= 5) & (agent_data["political participation"] <= 7),
-                 agent_data["political participation"] >= 8 ]
-    labels = ['Apathetic (0)', 'Spectators (1-4)', 'Transitionals (5-7)', 'Gladiators (8-12)']
-    colors = ['tan', 'orange', 'pink', 'red']
-    for pps, label, color in zip(pps_aggr, labels, colors):
-        sns.lineplot(data = agent_data[pps].groupby(['Step', 'run']).count(),
-                     x = 'Step',
-                     y = 'political participation',
-                     errorbar = 'sd',
-                     label = label,
-                     color = color)
-    plt.ylabel('count')
-    plt.legend()
-    plt.savefig(f"{result_path}agents_per_pp_aggr_network_{model.network}.png")
-    plt.clf()
-
-    # Save numerical results
-    pp = (agent_data.groupby(['Step', 'political participation']).count()['AgentID'] / params.n_runs).reset_index()
-    pp = pp[pp['Step'] >= params.n_iterations - 100].groupby('political participation').mean().reset_index()[['political participation', 'AgentID']]
-    with open(result_path + model.network, 'w') as file:
-        file.write(model_data.groupby('Step').mean()['voters'].iloc[-1000:-1].to_string(header=False, index=False) + '\n')
-
-        file.write(f"Apathetic: {pp[pp['political participation'] == 0]['AgentID'].sum()}\n")
-        file.write(f"Spectators: {pp[(pp['political participation'] > 0) & (pp['political participation'] <= 4)]['AgentID'].sum()}\n")
-        file.write(f"Transitionals: {pp[(pp['political participation'] > 4) & (pp['political participation'] <= 7)]['AgentID'].sum()}\n")
-        file.write(f"Gladiators: {pp[pp['political participation'] > 7]['AgentID'].sum()}\n")
-
-
-    # Set location
-    result_path = make_path('networks')
-
-    # Save graph
-    attrs = {node : {'cat' : get_category(node.pps), 'pps' : node.pps} for node in model.graph.nodes}
-    nx.set_node_attributes(model.graph, attrs)
-    nx.write_graphml(model.graph, f'{result_path}{network}.graphml')
-
-    print('Done!                ')
+                     y = 'voters',
+                     errorbar = 'sd')
+        plt.ylim(0, 100)
+        plt.savefig(f"{result_path}{network}_voters.png")
+        plt.clf()
+
+        # Plot the mean political participation over time, with the standard deviation over all
+        # agents of all runs
+        per_step = count_data.groupby('Step')[levels].sum()
+        n_agents = per_step.sum(axis = 1)
+        mean_pp = per_step @ np.arange(PP_LEVELS) / n_agents
+        sd_pp = np.sqrt((per_step * (np.arange(PP_LEVELS) - mean_pp.values[:, None])**2).sum(axis = 1) / (n_agents - 1))
+        plt.plot(mean_pp.index, mean_pp)
+        plt.fill_between(mean_pp.index, mean_pp - sd_pp, mean_pp + sd_pp, alpha = .2)
+        plt.xlabel('Step')
+        plt.ylabel('political participation')
+        plt.ylim(0,12)
+        plt.savefig(f"{result_path}{network}_mean_pp.png")
+        plt.clf()
+
+        # Plot number of agents with certain level of political participation over time
+        for pp in range(PP_LEVELS):
+            sns.lineplot(data = count_data,
+                         x = 'Step',
+                         y = f'pp_{pp}',
+                         errorbar = 'sd',
+                         label = pp)
+        plt.ylabel('count')
+        plt.legend()
+        plt.savefig(f"{result_path}{network}_agents_per_pp.png")
+        plt.clf()
+
+        # Plot number of agents within certain ranges of political participation over time
+        labels = ['Apathetic (0)', 'Spectators (1-4)', 'Transitionals (5-7)', 'Gladiators (8-12)']
+        colors = ['tan', 'orange', 'pink', 'red']
+        for category, label, color in zip(CATEGORIES, labels, colors):
+            sns.lineplot(data = count_data,
+                         x = 'Step',
+                         y = category,
+                         errorbar = 'sd',
+                         label = label,
+                         color = color)
+        plt.ylabel('count')
+        plt.legend()
+        plt.savefig(f"{result_path}agents_per_pp_aggr_network_{network}.png")
+        plt.clf()
+
+        # Save numerical results: the mean voters over time and in the tail window, and the mean
+        # number of agents per category over the last 100 steps, over all runs and per run
+        voters = model_data.groupby('steps_left')['voters'].mean().sort_index(ascending = False)
+        tail = (model_data['steps_left'] > 0) & (model_data['steps_left'] < params.tail_window)
+        last_steps = count_data['steps_left'] <= 100
+        summary = {'steps_left' : voters.index.to_numpy(),
+                   'voters' : voters.to_numpy(),
+                   'tail_voters' : voters[(voters.index > 0) & (voters.index < params.tail_window)].to_numpy(),
+                   'run_voters' : model_data[tail].groupby('run')['voters'].mean().reindex(runs).to_numpy(),
+                   'categories' : (count_data[last_steps].groupby('steps_left')[CATEGORIES].sum().mean() / params.n_runs).to_numpy(),
+                   'run_categories' : count_data[last_steps].groupby('run')[CATEGORIES].mean().reindex(runs).to_numpy()}
+        Summary_store().write(network, summary, params, runs, CATEGORIES)
+
+
+        # Set location
+        result_path = make_path('networks')
+
+        # Save graph
+        final_pps = store.load(network, last_run, 'pps')[-1]
+        attrs = {node : {'cat' : get_category(final_pps[node]), 'pps' : int(final_pps[node])} for node in graph.nodes}
+        nx.set_node_attributes(graph, attrs)
+        nx.write_graphml(graph, f'{result_path}{network}.graphml')
+
+        print('Done!                ')
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'Runs the model for all network types in the config.')
+    add_arguments(parser)
+    main(parser.parse_args())
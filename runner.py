@@ -0,0 +1,426 @@
+###### runner.py
+# Runs independent replicates of the model, either one after another or spread
+# over a pool of worker processes. Every (network, run) pair gets its own seed, so
+# the results don't depend on the number of workers, and workers only send back
+# compact numpy arrays instead of whole models.
+####
+
+# Internal imports
+from party import Party_model
+from vectorized import Vector_model
+from utils import get_config, make_seed, get_category
+from instruments import add_totals
+from checkpoint import get_state, set_state
+from store import Run_store
+from cache import Result_cache, inputs_hash
+from convergence import ci_width, is_stationary, tail_mean
+
+# External imports
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import json
+import os
+
+
+# Levels of political participation, and the names of the categories of levels (see utils.get_category)
+PP_LEVELS = 13
+CATEGORIES = ['Apathetic', 'Spectators', 'Transitionals', 'Gladiators']
+PP_CATEGORIES = np.array([get_category(pp) for pp in range(PP_LEVELS)])
+
+
+def make_model(params, network, seed = None, **kwargs):
+    '''
+    description: creates a model with the engine from the config
+    inputs:
+        - params: parameters imported from config/[name].py
+        - network: network structure of the model
+        - seed: optional, numpy SeedSequence of the model's random number generator
+        - kwargs: optional, other arguments of the model (e.g. prob_stimulus)
+    outputs:
+        - model object
+    '''
+    if seed is None:
+        seed = np.random.SeedSequence()
+
+    # mesa only accepts plain integers as seeds
+    model_class = Vector_model if params.engine == 'vectorized' else Party_model
+    return model_class(params = params, network = network, seed = int(seed.generate_state(1, np.uint64)[0]), **kwargs)
+
+
+def get_results(model):
+    '''
+    description: extracts the compact results of a finished model
+    inputs:
+        - model: model object to extract results from
+    outputs:
+        - dictionary with the recorded steps, voters per recorded step, political participation
+          per recorded step and agent, the links of the final social network and the name of its
+          graph class (implicit graphs store no links, see network.results_graph), the step at which
+          the burn-in ended (-1 if it wasn't detected), and if the model is instrumented the time
+          per phase and count per counter per step (see Instruments)
+    '''
+    recorder = model.datacollector
+    # Implicit graphs don't store their links, so neither do their results
+    edges = np.zeros((0, 2), dtype = np.int32) if model.graph.implicit else model.graph.edge_array()
+    burn_in = None if model.steady_state is None else model.steady_state.burn_in
+
+    return {'steps' : recorder.steps.copy(),
+            'voters' : recorder.voters.copy(),
+            'pps' : recorder.pps.copy(),
+            'edges' : edges,
+            'graph' : np.array(model.graph.name),
+            'burn_in' : np.array(-1 if burn_in is None else burn_in),
+            **model.instruments.to_arrays()}
+
+
+def run_seed(params, network, run):
+    '''
+    description: creates the seed of 1 run of run_replicates
+    inputs:
+        - params: parameters imported from config/[name].py
+        - network: network structure of the run
+        - run: number of the run
+    outputs:
+        - numpy SeedSequence of the run, keyed by the index of the network in params.networks
+          and the run, so every network has its own random streams
+    '''
+    return make_seed(params.seed, params.networks.index(network), run)
+
+
+def run_inputs(params, network, run):
+    '''
+    description: hashes everything that determines the results of 1 run of run_replicates (the
+                 config values, network and seed), which is saved with its results and
+                 checkpoints, so runs of another config are never resumed or reused
+    inputs:
+        - params: parameters imported from config/[name].py
+        - network: network structure of the run
+        - run: number of the run
+    outputs:
+        - hexadecimal hash (the same for every run of a config without a base seed)
+    '''
+    seed = run_seed(params, network, run)
+    return inputs_hash(params,
+                       network = network,
+                       seed = None if params.seed is None else [seed.entropy, list(seed.spawn_key)],
+                       kind = 'run')
+
+
+def simulate(config, network, run, seed, resume = False):
+    '''
+    description: runs 1 replicate of the model (in a worker process), for params.n_iterations
+                 steps or until it stops itself (see params.steady_state). If
+                 params.checkpoint_every is set, the state of the model is saved every that
+                 many steps in results/[network]/checkpoints/run_[run].npz. Checkpoints and
+                 results are saved with the run_inputs of the run, and only checkpoints with
+                 the same inputs are resumed.
+    inputs:
+        - config: name of the config file in configs/
+        - network: network structure of the model
+        - run: number of the replicate
+        - seed: numpy SeedSequence to seed the model with
+        - resume: optional, whether to continue from the last checkpoint of the run (if any)
+    outputs:
+        - network, run, and results of the model (see get_results)
+    '''
+    params = get_config(config)
+    model = make_model(params, network, seed)
+    inputs = np.array(run_inputs(params, network, run))
+
+    checkpoints = Run_store('checkpoints')
+    if resume and checkpoints.exists(network, run):
+        state = checkpoints.read(network, run)
+        if state.get('inputs') == inputs:
+            set_state(model, state)
+
+    while model.running and model.schedule.steps < params.n_iterations:
+        model.step()
+        if params.checkpoint_every and model.schedule.steps % params.checkpoint_every == 0 \
+           and model.schedule.steps < params.n_iterations:
+            checkpoints.write(network, run, {**get_state(model), 'inputs' : inputs})
+
+    return network, run, {**get_results(model), 'inputs' : inputs}
+
+
+def run_voters(model, params):
+    '''
+    description: runs a model for params.n_iterations steps or until it stops itself (see
+                 params.steady_state), or if params.early_stop is set until its voters are
+                 stationary (checked every params.stationary_window steps)
+    inputs:
+        - model: model object to run
+        - params: parameters imported from config/[name].py
+    outputs:
+        - if params.adaptive_runs the mean number of voters over the tail window (over the
+          last 2 stationary windows when stopped early), otherwise the number of voters at the end
+    '''
+    window = max(params.stationary_window // params.record_stride, 1)
+    recorder = model.datacollector
+    stopped = False
+    for iteration in range(params.n_iterations):
+        model.step()
+        if not model.running:
+            break
+        if params.early_stop and (iteration + 1) % params.stationary_window == 0 \
+           and is_stationary(recorder.voters, window, params.stationary_tolerance):
+            stopped = True
+            break
+
+    if not params.adaptive_runs:
+        return model.get_voters()
+    if stopped:
+        return recorder.voters[-2 * window:].mean()
+    return tail_mean(recorder.steps, recorder.voters, model.schedule.steps, params.tail_window)
+
+
+def simulate_voters(config, network, points, seeds):
+    '''
+    description: runs the model once for each parameter point and seed (in a worker process)
+    inputs:
+        - config: name of the config file in configs/
+        - network: network structure of the model
+        - points: list of dictionaries with the values of the varied parameters
+        - seeds: numpy SeedSequence per point
+    outputs:
+        - array with the voters of each run (see run_voters)
+        - totals of the instruments of all runs (empty if models are not instrumented)
+    '''
+    params = get_config(config)
+    voters = np.zeros(len(points))
+    totals = {}
+    for idx, (point, seed) in enumerate(zip(points, seeds)):
+        model = make_model(params, network, seed, **point)
+        voters[idx] = run_voters(model, params)
+        add_totals(totals, model.instruments.totals())
+    return voters, totals
+
+
+def evaluate_points(params, network, points, seeds, workers = 1, chunk_size = 10, checkpoint = None):
+    '''
+    description: runs the model for many parameter points, in chunks spread over a pool of
+                 worker processes. Finished chunks can be saved so an interrupted evaluation
+                 resumes where it stopped, and points that are in the result cache are not
+                 run again.
+    inputs:
+        - params: parameters imported from config/[name].py
+        - network: network structure of the model
+        - points: list of dictionaries with the values of the varied parameters
+        - seeds: numpy SeedSequence per point
+        - workers: optional, number of worker processes (1 runs everything in this process)
+        - chunk_size: optional, number of points per chunk
+        - checkpoint: optional, folder to save finished chunks in (None to not save them)
+    outputs:
+        - generator of (indices, voters, instrument totals) tuples per chunk, in order of
+          completion (totals are empty for chunks loaded from a checkpoint)
+    '''
+    config = params.__name__.split('.')[-1]
+    chunks = [list(range(start, min(start + chunk_size, len(points))))
+              for start in range(0, len(points), chunk_size)]
+
+    # Discard saved chunks that were made for another config, network, points, seeds or chunk size
+    if checkpoint is not None:
+        meta_file = f'{checkpoint}chunks.json'
+        meta = {'config' : inputs_hash(params),
+                'network' : network,
+                'chunk_size' : chunk_size,
+                'points' : [{name : float(value) for name, value in point.items()} for point in points],
+                'seeds' : [[seed.entropy, list(seed.spawn_key)] for seed in seeds]}
+        try:
+            with open(meta_file) as file:
+                saved = json.load(file)
+        except (OSError, ValueError):
+            saved = None
+        if saved != meta:
+            for name in os.listdir(checkpoint):
+                os.remove(checkpoint + name)
+            with open(meta_file, 'w') as file:
+                json.dump(meta, file)
+
+    # Load saved chunks and cached points, and collect the other points of each chunk as tasks
+    cache = Result_cache(params.cache_size)
+    keys = [cache.key(params, network, point, seed, 'voters') for point, seed in zip(points, seeds)]
+    tasks = []
+    for idx, chunk in enumerate(chunks):
+        chunk_file = None if checkpoint is None else f'{checkpoint}chunk_{idx}.npy'
+        if chunk_file is not None and os.path.exists(chunk_file):
+            yield chunk, np.load(chunk_file), {}
+            continue
+
+        cached = {i : cache.get(keys[i]) for i in chunk}
+        cached = {i : results['voters'] for i, results in cached.items() if results is not None}
+        missing = [i for i in chunk if i not in cached]
+        tasks.append((chunk, chunk_file, cached, missing,
+                      (config, network, [points[i] for i in missing], [seeds[i] for i in missing])))
+
+    def finish(chunk, chunk_file, cached, missing, results):
+        voters, totals = results
+        for i, voter in zip(missing, voters):
+            cache.put(keys[i], {'voters' : voter})
+            cached[i] = voter
+        voters = np.array([cached[i] for i in chunk], dtype = float)
+        if chunk_file is not None:
+            np.save(chunk_file, voters)
+        return chunk, voters, totals
+
+    # Chunks of which all points are cached don't need a worker
+    for chunk, chunk_file, cached, missing, task in tasks:
+        if not missing:
+            yield finish(chunk, chunk_file, cached, missing, ([], {}))
+    tasks = [task for task in tasks if task[3]]
+
+    if workers <= 1:
+        for chunk, chunk_file, cached, missing, task in tasks:
+            yield finish(chunk, chunk_file, cached, missing, simulate_voters(*task))
+        return
+
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = {executor.submit(simulate_voters, *task) : (chunk, chunk_file, cached, missing)
+                   for chunk, chunk_file, cached, missing, task in tasks}
+        for future in as_completed(futures):
+            yield finish(*futures[future], future.result())
+
+
+def replicate_points(params, network, points, seed, workers = 1, chunk_size = 10, checkpoint = None):
+    '''
+    description: runs params.n_runs replicates of the model for each parameter point. If
+                 params.adaptive_runs is set, rounds of params.n_runs more replicates are added
+                 to the points whose 95% confidence interval of the mean voters is wider than
+                 params.ci_width, until params.max_runs replicates.
+    inputs:
+        - params: parameters imported from config/[name].py
+        - network: network structure of the model
+        - points: list of dictionaries with the values of the varied parameters
+        - seed: function that returns the numpy SeedSequence of a (point index, run) pair
+        - workers: optional, number of worker processes (1 runs everything in this process)
+        - chunk_size: optional, number of runs per chunk (see evaluate_points)
+        - checkpoint: optional, folder to save finished chunks in (rounds after the first
+                      use the folder with _[round] appended)
+    outputs:
+        - generator of (point indices, runs, voters, instrument totals) tuples per chunk
+    '''
+    voters = [[] for point in points]
+    active = list(range(len(points)))
+    n_done = 0
+    n_rounds = 0
+    while active:
+        end = min(n_done + params.n_runs, params.max_runs) if params.adaptive_runs else params.n_runs
+        runs = range(n_done, end)
+        jobs = [(idx, run) for run in runs for idx in active]
+
+        folder = checkpoint
+        if checkpoint is not None and n_rounds > 0:
+            folder = f"{checkpoint.rstrip('/')}_{n_rounds}/"
+            os.makedirs(folder, exist_ok = True)
+
+        for chunk, values, totals in evaluate_points(params, network, [points[idx] for idx, run in jobs],
+                                                     [seed(idx, run) for idx, run in jobs], workers, chunk_size, folder):
+            for job, value in zip(chunk, values):
+                voters[jobs[job][0]].append(value)
+            yield [jobs[job][0] for job in chunk], [jobs[job][1] for job in chunk], values, totals
+
+        # Continue with the points whose mean isn't precise enough yet
+        n_done = end
+        n_rounds += 1
+        if not params.adaptive_runs or n_done >= params.max_runs:
+            break
+        active = [idx for idx in active if ci_width(voters[idx]) > params.ci_width]
+
+
+def run_replicates(params, networks, workers = 1, runs = None, resume = False):
+    '''
+    description: runs params.n_runs replicates of the model for each network, spread over
+                 a pool of worker processes. Every run is seeded with run_seed, so each run of
+                 each network has its own random stream. Runs that are in the result cache are
+                 loaded instead of run again.
+    inputs:
+        - params: parameters imported from config/[name].py
+        - networks: list of network structures to run
+        - workers: optional, number of worker processes (1 runs everything in this process)
+        - runs: optional, dictionary with the runs to do per network (default: all runs)
+        - resume: optional, whether runs continue from their last checkpoint (see simulate)
+    outputs:
+        - generator of (network, run, results) tuples, in order of completion
+    '''
+    config = params.__name__.split('.')[-1]
+    if runs is None:
+        runs = {network : range(params.n_runs) for network in networks}
+    # Load cached runs, and collect the others as tasks
+    cache = Result_cache(params.cache_size)
+    tasks = []
+    for network in networks:
+        for run in runs[network]:
+            seed = run_seed(params, network, run)
+            key = cache.key(params, network, {}, seed, 'run')
+            results = cache.get(key)
+            if results is not None:
+                yield network, run, {**results, 'inputs' : np.array(run_inputs(params, network, run))}
+            else:
+                tasks.append((key, (config, network, run, seed, resume)))
+
+    def finish(key, results):
+        cache.put(key, results[2])
+        return results
+
+    if workers <= 1:
+        for key, task in tasks:
+            yield finish(key, simulate(*task))
+        return
+
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = {executor.submit(simulate, *task) : key for key, task in tasks}
+        for future in as_completed(futures):
+            yield finish(futures[future], future.result())
+
+
+def model_frame(steps, voters, run):
+    '''
+    description: formats the voters of 1 run like mesa's datacollector does, with an extra
+                 column for the run
+    inputs:
+        - steps: recorded steps
+        - voters: number of voters per recorded step
+        - run: number of the run
+    outputs:
+        - dataframe with voters per step
+    '''
+    import pandas as pd
+
+    return pd.DataFrame({'Step' : steps,
+                         'voters' : voters,
+                         'run' : run})
+
+
+def pp_counts(pps):
+    '''
+    description: counts the agents at every level of political participation per recorded step
+                 of 1 run, in a single pass over the political participation of all agents
+    inputs:
+        - pps: political participation per recorded step and agent
+    outputs:
+        - (recorded steps, PP_LEVELS) array with the number of agents per step and level
+    '''
+    n_steps = len(pps)
+    bins = pps.astype(int) + PP_LEVELS * np.arange(n_steps)[:, None]
+    return np.bincount(bins.ravel(), minlength = n_steps * PP_LEVELS).reshape(n_steps, PP_LEVELS)
+
+
+def count_frame(steps, counts, run):
+    '''
+    description: formats the counts of agents per level of political participation of 1 run,
+                 with a row per recorded step, a column 'pp_[level]' per level and a column
+                 per category of levels (see CATEGORIES), and a column for the run
+    inputs:
+        - steps: recorded steps
+        - counts: number of agents per recorded step and level, from pp_counts
+        - run: number of the run
+    outputs:
+        - dataframe with the counts per step
+    '''
+    import pandas as pd
+
+    frame = pd.DataFrame(counts, columns = [f'pp_{pp}' for pp in range(PP_LEVELS)])
+    frame.insert(0, 'Step', steps)
+    frame['run'] = run
+    for category, name in enumerate(CATEGORIES):
+        frame[name] = counts[:, PP_CATEGORIES == category].sum(axis = 1)
+    return frame
@@ -5,54 +5,23 @@
 ####
 
 # Internal imports
-from party import Party_model
-from utils import make_path, get_config
+from utils import get_config
 
 # External imports
-from warnings import filterwarnings
-from SALib.sample import saltelli
-from SALib.analyze import sobol
-from mesa.batchrunner import BatchRunner
-import matplotlib.pyplot as plt
+from argparse import ArgumentParser
 from itertools import combinations
-from numpy import isnan
-
-
-# Prevent mesa's deprecation warnings that can't really be solved since the new version is 
-# buggy and has very poor documentation.
-filterwarnings("ignore") 
-
-# Import parameter configuration from file based on input argument (default: configs.normal)
-params = get_config()
-replicates = params.n_runs
-max_steps = params.n_iterations
-distinct_samples = params.n_distinct_samples
-problem = params.problem
-
-# Set the outputs
-model_reporters = {"voters" : lambda m : m.get_voters()}
-param_values = saltelli.sample(problem, distinct_samples, calc_second_order = False)
-
-# Create batchrunner
-batch = BatchRunner(Party_model, 
-                    max_steps = max_steps,
-                    variable_parameters = {name : [] for name in problem['names']},
-                    model_reporters = model_reporters)
-
-# Run for all combinations of parameter values
-voters_per_run = []
-for run in range(replicates):
-    for idx, vals in enumerate(param_values): 
-        vals = list(vals) # Change parameters that should be integers
-        
-        # Transform to dict with parameter names and their values
-        variable_parameters = {name : val for name, val in zip(problem['names'], vals)}
-        
-        # Run model
-        batch.run_iteration(variable_parameters, tuple(vals), run)
-        print(f'run {run * len(param_values) + idx} / {replicates * len(param_values)}', end = '\r', flush = True)
-
-print('saving results...       ', end = '\r', flush = True)
+
+
+def add_arguments(parser):
+    '''
+    description: adds the command line arguments of sobol.py to a parser
+    inputs:
+        - parser: argparse parser (or subcommand parser of cli.py)
+    '''
+    parser.add_argument('config', nargs = '?', default = 'normal', help = 'name of the config file in configs/')
+    parser.add_argument('--workers', type = int, default = 1, help = 'number of processes to run samples in')
+    parser.add_argument('--chunk-size', type = int, default = 10, help = 'number of runs per checkpointed chunk')
+
 
 def plot_index(s, params, i, title=''):
     """
@@ -66,6 +35,8 @@ def plot_index(s, params, i, title=''):
         - i: string that indicates what order the sensitivity is.
         - title: title for the plot
     """
+    from numpy import isnan
+    import matplotlib.pyplot as plt
 
     if i == '2':
         p = len(params)
@@ -87,28 +58,87 @@ def plot_index(s, params, i, title=''):
     plt.errorbar(indices, range(l), xerr=errors, linestyle='None', marker='o')
     plt.axvline(0, c='k')
 
-def plot_global(Si, problem):
+def plot_global(Si, problem, network):
     '''
     Description: plots the first and total order sensitivity of parameters
     Inputs:
         - Si: sensitivity
         - problem: dictionary of parameters to perform sensitivity analysis on
+        - network: network structure the analysis was done on
     '''
+    from utils import make_path
+    import matplotlib.pyplot as plt
 
     # set location
     result_path = make_path('sensitivity_analysis')
     
     # First order
     plot_index(Si, problem['names'], '1', 'First order sensitivity')
-    plt.savefig(f"{result_path}first-order_sensitivity_{params.networks[0]}.png")
+    plt.savefig(f"{result_path}first-order_sensitivity_{network}.png")
     plt.clf()
 
     # Total order
     plot_index(Si, problem['names'], 'T', 'Total order sensitivity')
-    plt.savefig(f"{result_path}total-order_sensitivity_{params.networks[0]}.png")
+    plt.savefig(f"{result_path}total-order_sensitivity_{network}.png")
     plt.clf()
 
-voters_per_run = batch.get_model_vars_dataframe()['voters'].values
-Si_voters = sobol.analyze(problem, voters_per_run, calc_second_order = False)
-plot_global(Si_voters, problem)
-print('done!            ')
+
+def main(args):
+    '''
+    description: runs the global sensitivity analysis, and saves its results and plots
+    inputs:
+        - args: parsed command line arguments (see add_arguments)
+    '''
+    # The simulation and sensitivity analysis libraries are only imported once there is something to do
+    from runner import replicate_points
+    from utils import make_path, make_seed
+    from instruments import add_totals, save_totals
+    from SALib.sample import saltelli
+    from SALib.analyze import sobol
+    from numpy import array, mean
+
+    # Import parameter configuration from file (configs/normal.py by default)
+    params = get_config(args.config)
+    replicates = params.n_runs
+    distinct_samples = params.n_distinct_samples
+    problem = params.problem
+
+    # Parameter values to run the model with
+    param_values = saltelli.sample(problem, distinct_samples, calc_second_order = False)
+    points = [{name : val for name, val in zip(problem['names'], vals)} for vals in param_values]
+    seed = lambda idx, run : make_seed(params.seed, run, idx)
+
+    # Run replicates for all combinations of parameter values (adding replicates until the mean
+    # voters are precise enough if params.adaptive_runs is set), saving finished chunks so the
+    # analysis can be resumed
+    voters = [{} for point in points]
+    checkpoint = make_path(f'sensitivity_analysis/sobol_{params.networks[0]}_chunks')
+    done = 0
+    totals = {}
+    for chunk, runs, chunk_voters, chunk_totals in replicate_points(params, params.networks[0], points, seed, args.workers, args.chunk_size, checkpoint):
+        for idx, run, voter in zip(chunk, runs, chunk_voters):
+            voters[idx][run] = voter
+        add_totals(totals, chunk_totals)
+        done += len(chunk)
+        print(f'run {done}', end = '\r', flush = True)
+
+    # Every replicate counts as a sample, or with adaptive replicates (which differ in number
+    # per sample) the mean over the replicates of each sample
+    if params.adaptive_runs:
+        voters_per_run = array([mean(list(sample.values())) for sample in voters])
+    else:
+        voters_per_run = array([[sample[run] for sample in voters] for run in range(replicates)]).ravel()
+
+    print('saving results...       ', end = '\r', flush = True)
+    if params.instrument:
+        save_totals(totals, f"{make_path('sensitivity_analysis')}sobol_instruments_{params.networks[0]}.json")
+
+    Si_voters = sobol.analyze(problem, voters_per_run, calc_second_order = False)
+    plot_global(Si_voters, problem, params.networks[0])
+    print('done!            ')
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'Runs global sensitivity analysis on the first network in the config.')
+    add_arguments(parser)
+    main(parser.parse_args())
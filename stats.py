@@ -0,0 +1,187 @@
+###### stats.py
+# Runs the statistical tests that checks whether there is a significant difference 
+# between different network implementations (or other conditions) in the model, on
+# the summaries that run.py saves in results/summaries/. (Named stats.py, since a statistics.py here
+# would hide the standard library module from seaborn.)
+####
+
+# External imports
+from argparse import ArgumentParser
+
+
+def add_arguments(parser):
+    '''
+    description: adds the command line arguments of stats.py to a parser
+    inputs:
+        - parser: argparse parser (or subcommand parser of cli.py)
+    '''
+    parser.add_argument('conditions', nargs = '*', default = [],
+                        help = "conditions to compare as '[config]/[network]' (all conditions saved by run.py if none given)")
+    parser.add_argument('--vary', nargs = '+', default = [],
+                        help = 'config parameters that may differ between the compared conditions (besides the network)')
+    parser.add_argument('--resamples', type = int, default = 10000, help = 'number of bootstrap resamples and permutations per test')
+    parser.add_argument('--seed', type = int, default = 0, help = 'seed of the bootstrap resamples and permutations')
+    parser.add_argument('--workers', type = int, default = 1, help = 'number of processes to spread the resamples over')
+
+
+def reform_list(nr_per_cat, idx):
+    '''
+    description: returns the number of agents in 1 category for every condition
+    '''
+    return [int(nr_list[idx]) for nr_list in nr_per_cat]
+
+
+def main(args):
+    '''
+    description: compares the results of run.py for several networks, and saves the results
+                 of the tests and plots in results/statistics/
+    inputs:
+        - args: parsed command line arguments (see add_arguments)
+    '''
+    # Internal imports
+    from utils import make_path
+    from summary import Summary_store
+    from cache import IGNORED_PARAMS
+    from inference import bootstrap_ci, permutation_test, pairwise_permutation_tests
+
+    # External imports (only when the tests are run, since they are slow to import)
+    from scipy import stats
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    import scikit_posthocs as sp
+    from numpy import mean, std, add
+
+    # Initialize string to store results in
+    results = ''
+
+    # List of condition names to loop over (all conditions in the manifest by default)
+    store = Summary_store()
+    manifest = store.manifest()
+    conditions = args.conditions if args.conditions else list(manifest)
+    missing = [condition for condition in conditions if condition not in manifest]
+    if missing:
+        raise ValueError(f"no results of run.py for {', '.join(missing)}")
+
+    # Only compare conditions whose configs differ in the network and the parameters passed with --vary
+    configs = [manifest[condition]['config'] for condition in conditions]
+    names = sorted({name for config in configs for name in config} - set(IGNORED_PARAMS) - set(args.vary))
+    different = [name for name in names if any(config.get(name) != configs[0].get(name) for config in configs)]
+    if different:
+        raise ValueError(f"the configs of the conditions differ in {', '.join(different)}; "
+                         f"pass these with --vary to compare them anyway")
+
+    # Initialize dictionary with voter percentages per condition
+    voter_dict = {}
+
+    # List of categories for the chi square test
+    cat_list = manifest[conditions[0]]['categories'] if conditions else []
+
+    # List of list of number of agents in each category per condition
+    nr_per_cat = []
+
+    # Loop over all conditions, loading only the arrays the tests use
+    for condition in conditions:
+
+        # Mean voters per step of the tail window
+        floats = store.load(condition, 'tail_voters').tolist()
+        results += f"For {condition}, the mean is {mean(floats):.3f} with SD {std(floats):.3f}\n"
+        voter_dict[condition] = floats
+
+        # Mean number of agents per category of political participation
+        nr_per_cat.append(store.load(condition, 'categories').tolist())
+
+    # Descriptives
+    contig_table = pd.DataFrame(nr_per_cat, columns = cat_list, index = conditions)
+    results += f"The number of agents per category is: \n {contig_table}\n\n"
+
+    # ANOVA
+    if (stats.levene(*list(voter_dict.values())).pvalue) <= 0.05:
+        # For unequally distributed variances
+        results += (f"The assumption of equality of variances was not met;" 
+                    f"{stats.levene(*list(voter_dict.values())).pvalue}\n"
+                    f"Therefore, the results of the Kruskal-Wallis test were:" 
+                    f"{stats.kruskal(*list(voter_dict.values()))}\n\n")
+        post_hoc = sp.posthoc_dunn((list(voter_dict.values())), p_adjust = 'bonferroni')
+        post_hoc.columns = conditions
+        post_hoc.index = conditions
+        results += f"Post hoc testing reveals the following: \n {post_hoc}\n"
+    else:
+        results += (f"The assumption of equality of variances was met.\n"
+                    f"Therefore, the results of the ANOVA test were:"
+                    f"{stats.f_oneway(*list(voter_dict.values()))} \n"
+                    f"The results of the post-hoc are the following: _\n")
+
+    # Chi square
+    test_chi, p_val_chi, dof = stats.chi2_contingency(nr_per_cat)[0:3]
+    results += (f"The results of the Pearson's chi test for independence are as follows: \n"
+                f"Test statistic:{test_chi} \nP-value: {p_val_chi}, degrees of freedom: {dof}\n\n")
+
+    posthoc_chi = pd.DataFrame(columns = conditions, index = conditions)
+    for index, cond_1 in enumerate(nr_per_cat):
+        for index_2, cond_2 in enumerate(nr_per_cat):
+            p_val_chi = stats.chi2_contingency([cond_1, cond_2])[1]
+            posthoc_chi.iloc[index, index_2] = p_val_chi
+    results += f"A pairwise comparison of the groups reveals the following: \n{posthoc_chi}\n\n"
+
+    # Bootstrap confidence intervals and permutation tests on the results of every run (the mean
+    # voters over the tail window, and the mean number of agents per category over the last 100 steps)
+    run_voters = [store.load(condition, 'run_voters') for condition in conditions]
+    run_categories = [store.load(condition, 'run_categories') for condition in conditions]
+    options = {'n_resamples' : args.resamples, 'seed' : args.seed, 'workers' : args.workers}
+
+    intervals = pd.DataFrame([bootstrap_ci(voters, key = (idx,), **options) for idx, voters in enumerate(run_voters)],
+                             columns = ['mean', 'lower', 'upper'], index = conditions)
+    results += f"Bootstrap 95% confidence intervals of the mean voters per run: \n{intervals}\n\n"
+
+    intervals = pd.DataFrame(index = conditions, columns = cat_list)
+    for idx, categories in enumerate(run_categories):
+        means, lower, upper = bootstrap_ci(categories, key = (idx,), **options)
+        intervals.iloc[idx] = [f"{mu:.3f} [{low:.3f}, {up:.3f}]" for mu, low, up in zip(means, lower, upper)]
+    results += f"Bootstrap 95% confidence intervals of the mean number of agents per category per run: \n{intervals.to_string()}\n\n"
+
+    for name, groups in [('voters', run_voters), ('number of agents per category', run_categories)]:
+        statistic, p_value = permutation_test(groups, **options)
+        pairwise = pd.DataFrame(pairwise_permutation_tests(groups, **options), columns = conditions, index = conditions)
+        results += (f"Permutation test of the {name} per run across conditions: \n"
+                    f"Test statistic: {statistic} \nP-value: {p_value}\n"
+                    f"Pairwise permutation tests (Bonferroni-adjusted p-values): \n{pairwise}\n\n")
+
+
+
+    ## Visualizations 
+
+    # Set location
+    path = make_path('statistics')
+
+    # Textfile with results
+    with open(f'{path}statistical_tests', 'w') as file:
+        file.write(results)
+
+    # Boxplot
+    fig = plt.figure(figsize = (10, 10))
+    ax = fig.add_subplot(111)
+    ax.boxplot(list(voter_dict.values()), labels = conditions, showmeans = True)
+    ax.set_title("Voter percentage across conditions", fontsize = 20)
+    plt.savefig(f"{path}results_boxplot.png")
+    plt.clf()
+
+    # Stacked bar chart
+    apathetic = reform_list(nr_per_cat, 0)
+    spectators = reform_list(nr_per_cat, 1)
+    transitionals = reform_list(nr_per_cat, 2)
+    gladiators = reform_list(nr_per_cat, 3)
+
+    plt.bar(conditions, apathetic, color = "tan")
+    plt.bar(conditions, spectators, bottom = apathetic, color = "orange" )
+    spec_apath = add(spectators, apathetic).tolist()
+    plt.bar(conditions, transitionals, bottom = spec_apath, color = "pink")
+    plt.bar(conditions, gladiators, bottom = add(spec_apath, transitionals).tolist(), color = "red")
+    plt.title("Bar plot of number of agents in each political participation category")
+    plt.savefig(f"{path}barplot.png")
+    plt.clf()
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description = 'Tests whether the results of run.py differ between networks.')
+    add_arguments(parser)
+    main(parser.parse_args())
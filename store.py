@@ -0,0 +1,130 @@
+###### store.py
+# Specifies the Run_store class, which writes the results of every run to disk as
+# soon as the run finishes (one .npz file per network and run), so results don't
+# have to be kept in memory until all runs are done, and can be read back one
+# array at a time.
+####
+
+# Internal imports
+from utils import make_path
+
+# External imports
+import numpy as np
+import os
+
+
+class Run_store():
+    '''
+    Description: a Run_store saves the arrays of each run in results/[network]/runs/run_[run].npz
+                 and reads them back lazily.
+    Inputs:
+        - folder: optional, name of the folder in each network's results folder
+    Functions:
+        - write(network, run, results): saves the results of a run
+        - load(network, run, field): loads 1 array of a run
+        - iter_field(network, runs, field): loads 1 array of each run, one run at a time
+        - runs(network): returns the runs that are stored for a network
+        - fields(network, run): returns the names of the arrays of a run
+        - read(network, run): loads all arrays of a run
+        - exists(network, run): checks whether a run is stored
+        - remove(network, run): deletes the stored arrays of a run
+    '''
+
+    def __init__(self, folder = 'runs'):
+        self.folder = folder
+
+
+    def path(self, network, run):
+        return f'{make_path(f"{network}/{self.folder}")}run_{run}.npz'
+
+
+    def write(self, network, run, results):
+        '''
+        Description: saves the results of a run, replacing earlier results of the same run.
+                     The file is written under a temporary name first, so an interrupted
+                     write never leaves a corrupt file behind.
+        Inputs:
+            - network: network structure of the run
+            - run: number of the run
+            - results: dictionary of numpy arrays
+        '''
+        path = self.path(network, run)
+        with open(path + '.tmp', 'wb') as file:
+            np.savez(file, **results)
+        os.replace(path + '.tmp', path)
+
+
+    def load(self, network, run, field):
+        '''
+        Description: loads 1 array of the results of a run
+        Inputs:
+            - network: network structure of the run
+            - run: number of the run
+            - field: name of the array to load
+        Outputs:
+            - the stored array
+        '''
+        with np.load(self.path(network, run)) as results:
+            return results[field]
+
+
+    def fields(self, network, run):
+        '''
+        Description: returns the names of the arrays stored for a run
+        Inputs:
+            - network: network structure of the run
+            - run: number of the run
+        Outputs:
+            - list of names
+        '''
+        with np.load(self.path(network, run)) as results:
+            return list(results.files)
+
+
+    def read(self, network, run):
+        '''
+        Description: loads all arrays of a run
+        Inputs:
+            - network: network structure of the run
+            - run: number of the run
+        Outputs:
+            - dictionary of numpy arrays
+        '''
+        with np.load(self.path(network, run)) as results:
+            return dict(results)
+
+
+    def exists(self, network, run):
+        return os.path.exists(self.path(network, run))
+
+
+    def remove(self, network, run):
+        if self.exists(network, run):
+            os.remove(self.path(network, run))
+
+
+    def iter_field(self, network, runs, field):
+        '''
+        Description: loads 1 array of each of the given runs, one run at a time
+        Inputs:
+            - network: network structure of the runs
+            - runs: numbers of the runs to load
+            - field: name of the array to load
+        Outputs:
+            - generator of (run, array) tuples
+        '''
+        for run in runs:
+            yield run, self.load(network, run, field)
+
+
+    def runs(self, network):
+        '''
+        Description: returns the numbers of the runs that are stored for a network
+        Inputs:
+            - network: network structure of the runs
+        Outputs:
+            - sorted list of run numbers
+        '''
+        folder = make_path(f'{network}/{self.folder}')
+        return sorted(int(name[4:-4]) for name in os.listdir(folder)
+                      if name.startswith('run_') and name.endswith('.npz'))
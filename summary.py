@@ -0,0 +1,104 @@
+###### summary.py
+# Specifies the Summary_store class, which saves the summary of all runs of each
+# network that run.py produces (voters over time, mean voters in the tail window and
+# agents per category of political participation, overall and per run) as one .npz
+# file per condition (a network run with a config), next to a JSON manifest with the
+# config and seeds of every stored condition. stats.py finds the conditions to
+# compare in the manifest, and loads only the arrays it uses.
+####
+
+# Internal imports
+from utils import make_path, config_values
+
+# External imports
+import numpy as np
+import json
+import os
+
+
+class Summary_store():
+    '''
+    Description: a Summary_store saves the summary of each condition, a network run with a
+                 config, in results/summaries/[config]/[network].npz, and lists the stored
+                 conditions as '[config]/[network]' in results/summaries/manifest.json, with the
+                 config values, base seed and runs of each.
+    Inputs:
+        - folder: optional, folder in results/ to keep the summaries in
+    Functions:
+        - write(network, summary, params, runs, categories): saves the summary of a condition
+        - manifest(): returns the manifest
+        - conditions(): returns the conditions that are stored
+        - load(condition, field): loads 1 array of the summary of a condition
+    '''
+
+    def __init__(self, folder = 'summaries'):
+        self.folder = folder
+
+
+    def path(self, name):
+        return f'{make_path(self.folder)}{name}'
+
+
+    def manifest(self):
+        '''
+        Description: reads the manifest of the stored conditions
+        Outputs:
+            - dictionary with an entry per condition, in the order they were first stored
+        '''
+        try:
+            with open(self.path('manifest.json')) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+
+    def conditions(self):
+        return list(self.manifest())
+
+
+    def write(self, network, summary, params, runs, categories):
+        '''
+        Description: saves the summary of a condition, replacing an earlier summary of the same
+                     network and config, and records it in the manifest. Both files are written
+                     under a temporary name first, so an interrupted write never leaves a corrupt file.
+        Inputs:
+            - network: network structure of the runs
+            - summary: dictionary of numpy arrays
+            - params: parameters imported from config/[name].py that the runs used
+            - runs: numbers of the summarized runs (run r is seeded with runner.run_seed)
+            - categories: names of the categories of political participation, in the order of
+                          the category arrays in summary
+        '''
+        config = params.__name__.split('.')[-1]
+        condition = f'{config}/{network}'
+        make_path(f'{self.folder}/{config}')
+        with open(self.path(f'{condition}.npz.tmp'), 'wb') as file:
+            np.savez(file, **summary)
+        os.replace(self.path(f'{condition}.npz.tmp'), self.path(f'{condition}.npz'))
+
+        manifest = self.manifest()
+        manifest[condition] = {'file' : f'{condition}.npz',
+                               'config_name' : config,
+                               'network' : network,
+                               'fields' : sorted(summary),
+                               'categories' : list(categories),
+                               'runs' : [int(run) for run in runs],
+                               'seed' : params.seed,
+                               'tail_window' : params.tail_window,
+                               'config' : config_values(params)}
+        with open(self.path('manifest.json.tmp'), 'w') as file:
+            json.dump(manifest, file, indent = 1, default = str)
+        os.replace(self.path('manifest.json.tmp'), self.path('manifest.json'))
+
+
+    def load(self, condition, field):
+        '''
+        Description: loads 1 array of the summary of a condition
+        Inputs:
+            - condition: name of the condition, '[config]/[network]'
+            - field: name of the array to load
+        Outputs:
+            - the stored array
+        '''
+        with np.load(self.path(f'{condition}.npz')) as summary:
+            return summary[field]
@@ -5,9 +5,9 @@
 # External imports
 from math import sqrt
 from importlib import import_module
-import pandas as pd
+from types import ModuleType, FunctionType
+import numpy as np
 import os
-import sys
 
 
 def set_valid(param, lower = 0, upper = 5, verbose = False, name = ''):
@@ -50,21 +50,6 @@ def distance_normalizer(distance):
     return distance / sqrt(5**2 * 3 + 2**2) * 1.5 + .5
 
 
-def safe_run_data(data, run_data, run):
-    '''
-    description: formats and adds the data of 1 run to the full dataframe of results.
-    inputs:
-        - data: the full dataframe of results
-        - run_data: unformatted results of current run of the model
-        - run: which number run run_data came from
-    outputs:
-        - data with run_data formatted and added to it
-    '''
-    run_data = run_data.reset_index().rename(columns = {'index' : 'Step'})
-    run_data['run'] = run
-    return pd.concat([data, run_data], ignore_index = True)
-
-
 def make_path(path = ''):
     '''
     description: creates folder(s) to save results into
@@ -82,10 +67,39 @@ def make_path(path = ''):
 def get_config(config = None):
     '''
     description: retrieves hyperparameters from config file (uses configs/normal.py if none given)
+    inputs:
+        - config: optional, name of the config file in configs/
     outputs:
         - hyperparameters form config file
     '''
-    return import_module('configs.' + (config if config is not None else ('normal' if len(sys.argv) < 2 else sys.argv[1])))
+    return import_module('configs.' + (config if config is not None else 'normal'))
+
+
+def config_values(params):
+    '''
+    description: returns the values set in a config file, leaving out the modules, functions
+                 and classes it imports
+    inputs:
+        - params: parameters imported from config/[name].py
+    outputs:
+        - dictionary with the value per parameter name
+    '''
+    return {name : value for name, value in vars(params).items()
+            if not name.startswith('_') and not isinstance(value, (ModuleType, FunctionType, type))}
+
+
+def make_seed(seed, *key):
+    '''
+    description: creates the seed of 1 task (e.g. 1 run of the model), which is the same every
+                 time for the same seed and key, and independent of the seeds of other keys.
+    inputs:
+        - seed: base seed (None for a random base seed)
+        - key: integers identifying the task
+    outputs:
+        - numpy SeedSequence of the task
+    '''
+    return np.random.SeedSequence(seed, spawn_key = key)
+
 
 # Categorize agents to save as graph
 def get_category(pp):
@@ -0,0 +1,515 @@
+###### vectorized.py
+# Specifies the Vector_model class, an alternative to Party_model that keeps all
+# agent state in numpy arrays (struct-of-arrays) and performs every agent phase
+# (stimulus, interaction, linking, moving, aging and updating political
+# participation) as batched array operations instead of per-agent Member.step calls.
+####
+
+# Internal imports
+from utils import get_config, set_valid, distance_normalizer
+from paths import Path_index
+from distances import Trait_distances
+from network import Csr_graph, make_graph, pick_backend
+from recorder import Recorder
+from instruments import Instruments, No_instruments
+from convergence import Steady_state
+
+# External imports
+import numpy as np
+from mesa import Model, time
+
+
+# Order of the columns of Vector_model.chars
+CHARACTERISTICS = ['active', 'overt', 'autonomous', 'approaching',
+                   'continuous', 'outtaking', 'expressive', 'social']
+ACTIVE, OVERT, AUTONOMOUS, APPROACHING, CONTINUOUS, OUTTAKING, EXPRESSIVE, SOCIAL = range(8)
+
+# Bounds of the random thresholds of the political participation levels 2 to 12
+PP_THRESHOLDS = np.array([[2, 4], [12, 18], [4, 6], [10, 14], [1, 3], [7, 11],
+                          [15, 21], [7, 11], [10, 14], [15, 21], [15, 21]])
+
+
+def draw_thresholds(rng, n_agents):
+    '''
+    description: draws the random thresholds of all political participation levels for
+                 all agents at once
+    inputs:
+        - rng: numpy random generator to draw from
+        - n_agents: number of agents to draw thresholds for
+    outputs:
+        - (n_agents, 11) array of thresholds for levels 2 to 12
+    '''
+    return rng.integers(PP_THRESHOLDS[:, 0], PP_THRESHOLDS[:, 1] + 1, size = (n_agents, len(PP_THRESHOLDS)))
+
+
+def pp_scores(chars, ses, contacts, time_in_community):
+    '''
+    description: calculates the linear combination of characteristics that is compared to
+                 the threshold of each political participation level (see Member.update_pp)
+    inputs:
+        - chars: (n_agents, 8) array of characteristics, in the order of CHARACTERISTICS
+        - ses: socio-economic status per agent
+        - contacts: number of contacts per agent
+        - time_in_community: time in community per agent
+    outputs:
+        - (n_agents, 11) array of scores for levels 2 to 12
+    '''
+    act, ovr, aut, app, con, out, exp, soc = chars.T
+    sta = (5 / 3) * ses
+    con_rate = (2.5 * contacts) / time_in_community
+    return np.stack([act + app - sta,
+                     act + ovr + app + soc + con_rate,
+                     ovr + exp,
+                     ovr + aut + app + out,
+                     act + app - out + exp - soc,
+                     ovr + soc + con_rate,
+                     act + ovr + app + out + exp + sta,
+                     con + exp + sta,
+                     act + ovr + con + sta,
+                     act + ovr + app + con + con_rate + sta,
+                     act + ovr + aut + app + con - out + con_rate + sta], axis = 1)
+
+
+def cascade_pp(scores, thresholds, base, vote_duty, eligible):
+    '''
+    description: evaluates the hierarchical political participation cascade for all agents
+                 at once, where level n + 1 is only reached if level n was reached.
+    inputs:
+        - scores: (n_agents, 11) scores per level, from pp_scores
+        - thresholds: (n_agents, 11) thresholds per level, from draw_thresholds
+        - base: political participation when level 2 is not reached (0 or 1)
+        - vote_duty: whether agents pass level 2 regardless of their score
+        - eligible: whether agents are allowed to go past their base level
+    outputs:
+        - political participation per agent
+    '''
+    passed = scores > thresholds
+    passed[:, 0] |= vote_duty
+
+    # Number of levels passed before the first failing level
+    reached = np.cumprod(passed, axis = 1).sum(axis = 1)
+    return np.where(eligible & (reached > 0), reached + 1, base)
+
+
+class Vector_model(Model):
+    '''
+    Description: a Vector_model holds the environment parameters and the state of all
+                 agents as arrays, and simulates the same dynamics as Party_model with
+                 Member agents, but batched over the whole population.
+    Inputs:
+        - prob_stimulus: probability that a stimulus happens to all agents each step
+        - prob_interaction: probability that an agent interacts each step,
+        - prob_move: probability that an agent moves community,
+        - prob_link: probability that an agent creates a link to another agent during initialization
+        - network: which network structure to initialize the social network of agents with
+        - params: parameters imported from config/[name].py
+        - dynamic: whether the network structure changes over time
+        - instrument: optional, whether to time the phases of each step and count hot-path events
+        - seed: optional, seed (or numpy SeedSequence) of the model's random number generator,
+                which all random draws of the model go through
+    Functions:
+        - init_agents(): initialize the state arrays of all agents
+        - step(): updates model environment and takes a step for all agents
+        - get_voters(): returns the number of voters in the model (#agents where pps >= 2)
+        - get_pps(): returns the political participation of all agents
+        - get_agent_state(): returns the state of all agents as arrays (e.g. for checkpoints)
+        - set_agent_state(state): sets the state of all agents from arrays made by get_agent_state
+        - get_traits(agents): returns the traits that distances between agents are based on
+    '''
+
+    def __init__(self,
+                 prob_stimulus = None,
+                 prob_interaction = None,
+                 prob_move = None,
+                 prob_link = None,
+                 dynamic = False,
+                 network = None,
+                 params = None,
+                 instrument = None,
+                 seed = None):
+
+        # Handle Initializing when not provided
+        if params is None:
+            params = get_config()
+        if prob_stimulus is None:
+            prob_stimulus = params.prob_stimulus
+        if prob_interaction is None:
+            prob_interaction = params.prob_interaction
+        if prob_move is None:
+            prob_move = params.prob_move
+        if prob_link is None:
+            prob_link = params.prob_link
+        if network is None:
+            network = params.networks[0]
+        if instrument is None:
+            instrument = params.instrument
+
+        # Initialize probabilities and check whether they are in range [0,1]
+        self.prob_stimulus = set_valid(prob_stimulus, upper = 1, verbose = True, name = 'prob_stimulus')
+        self.prob_interaction = set_valid(prob_interaction, upper = 1, verbose = True, name = 'prob_interaction')
+        self.prob_move = set_valid(prob_move, upper = 1, verbose = True, name = 'prob_move')
+        self.prob_link = set_valid(prob_link, upper = 1, verbose = True, name = 'linkage')
+
+        # Initialize parameters based on config
+        self.until_eligible = params.until_eligible
+        self.characteristics_affected = params.characteristics_affected
+        self.edges_per_step = params.edges_per_step
+        self.n_agents = params.n_agents
+        self.fermi_alpha = params.fermi_alpha
+        self.fermi_b = params.fermi_b
+        self.network = network
+        self.dynamic = dynamic
+
+        # Initialize standard parameters
+        self.rng = np.random.default_rng(seed)
+        self.schedule = time.BaseScheduler(self)
+        self.stimulus = False
+        self.running = True
+        self.instruments = Instruments() if instrument else No_instruments()
+        self.datacollector = Recorder(self.n_agents, params.n_iterations, params.record_stride)
+        self.steady_state = Steady_state(params.post_burn_in, params.stationary_tolerance, params.steady_check_every) if params.steady_state else None
+
+        # Create graph (nodes are indices into the state arrays), index of path lengths in the graph and distances between traits.
+        # Networks that don't change are stored as compact Csr_graphs, or without links if implicit
+        self.paths = Path_index(self, params.path_cutoff)
+        self.trait_distances = Trait_distances(self, params.distance_cache)
+        backend = pick_backend(params.graph_backend, network, dynamic)
+        self.graph = make_graph(network, self.n_agents, params.m_barabasi, prob_link, self.rng, backend)
+
+        # Initialize agents and do first datacollection (step 0 of the instruments)
+        self.init_agents(params.char_distr)
+        if backend == 'csr' and network == 'homophily':
+            self.graph = Csr_graph.from_arrays(*self.graph.to_arrays())
+            self.paths.clear()
+        self.datacollector.collect(self)
+        self.instruments.end_step()
+
+
+    def init_agents(self, char_distr):
+        '''
+        Description: initialize the state arrays of all agents
+        Inputs:
+            - char_distr: from which random distribution initialization of characteristics are
+                          drawn
+        '''
+        n = self.n_agents
+
+        # Generate agent characteristics
+        if char_distr == 'normal': # Truncated normal distribution, to stay within limits
+            from scipy.stats import truncnorm
+
+            mu = 2
+            chars = truncnorm(-mu, mu, loc = mu, scale = 1).rvs((n, 8), random_state = self.rng)
+        elif char_distr == 'uniform': # Uniform distribution within limits
+            chars = self.rng.uniform(1, 5, (n, 8))
+        self.chars = np.clip(chars, 0, 5)
+        self.ses = self.rng.integers(1, 4, n)
+        self.vote_duty = self.rng.uniform(0, 1, n) < .03
+
+        # All agents start as if they just moved into the community
+        self.time_in_community = np.ones(n, dtype = int)
+        self.contacts = np.zeros(n, dtype = int)
+        self.until_eligible_left = np.full(n, self.until_eligible)
+        self.pps = np.zeros(n, dtype = int)
+
+        # Initialize social connections based on similarity, where each agent only
+        # knows of the agents that were created before it
+        if self.network == 'homophily':
+            for agent in range(n):
+                self.new_social(agent)
+                self.remove_social(agent)
+                self.graph.add_node(agent)
+
+        self.update_pp()
+
+
+    def step(self):
+        '''
+        Description: updates environment and takes a step for all agents
+        '''
+
+        # Check whether stimulus happens for all agents
+        self.stimulus = self.rng.uniform(0, 1) < self.prob_stimulus
+        if self.stimulus:
+            self.instruments.count('stimulus_ticks')
+            with self.instruments.phase('stimulus'):
+                self.apply_stimulus(self.pps != 0)
+
+        # Interact
+        with self.instruments.phase('interact'):
+            self.interact(np.flatnonzero(self.rng.uniform(0, 1, self.n_agents) < self.prob_interaction))
+
+        # Modify connections if model is dynamic
+        if self.dynamic:
+            with self.instruments.phase('rewire'):
+                for agent in self.rng.permutation(self.n_agents):
+                    self.new_social(agent)
+                    self.remove_social(agent)
+
+        # Move community
+        with self.instruments.phase('move'):
+            moved = self.rng.uniform(0, 1, self.n_agents) < self.prob_move
+            self.time_in_community[moved] = 1
+            self.contacts[moved] = 0
+            self.until_eligible_left[moved] = self.until_eligible
+
+        # Update parameters
+        with self.instruments.phase('update_pp'):
+            self.time_in_community += 1
+            np.maximum(self.until_eligible_left - 1, 0, out = self.until_eligible_left)
+            self.update_pp()
+
+        self.schedule.step()
+        with self.instruments.phase('collect'):
+            self.datacollector.collect(self)
+        self.instruments.end_step()
+
+        # Stop once the voters have been in steady state for long enough
+        recorder = self.datacollector
+        if self.steady_state is not None and self.steady_state.update(self.schedule.steps, recorder.steps, recorder.voters):
+            self.running = False
+
+
+    def apply_stimulus(self, affected):
+        '''
+        Description: subjects the affected agents to a stimulus, in the same order and with
+                     the same modification as Member.stimulus
+        Inputs:
+            - affected: boolean mask of agents subject to the stimulus
+        '''
+        chars = self.chars[affected]
+        for name in ['active', 'overt', 'continuous', 'expressive', 'outtaking']:
+            if name not in self.characteristics_affected:
+                continue
+
+            coin = self.rng.integers(0, 2, len(chars))
+            with np.errstate(divide = 'ignore'):
+                mod = 3 * (self.characteristics_affected[name] - coin) / (chars[:, AUTONOMOUS] + chars[:, CONTINUOUS])
+
+            # Expressive and outtaking are modified relative to continuous, as in Member.stimulus
+            base = CONTINUOUS if name in ['expressive', 'outtaking'] else CHARACTERISTICS.index(name)
+            chars[:, CHARACTERISTICS.index(name)] = np.clip(mod + chars[:, base], 0, 5)
+        self.chars[affected] = chars
+
+
+    def path_lengths(self, sources, targets):
+        '''
+        Description: calculates the path lengths between pairs of agents in the social network
+        Inputs:
+            - sources: agents at the start of the paths
+            - targets: agents at the end of the paths
+        Outputs:
+            - path length per pair (inf if there is no path within the cutoff of the index)
+        '''
+        # Implicit graphs link every pair of (different) agents or none, as long as they don't change
+        if self.graph.implicit:
+            return np.full(len(sources), 1. if self.graph.number_of_edges() else np.inf)
+
+        lengths = np.full(len(sources), np.inf)
+        if self.graph.number_of_edges() == 0:
+            return lengths
+        for idx, (source, target) in enumerate(zip(sources, targets)):
+            length = self.paths.path_length(source, target)
+            if length is not None:
+                lengths[idx] = length
+        return lengths
+
+
+    def interaction_modifiers(self, agents, partners):
+        '''
+        Description: calculates how much the characteristics of agents should be modified
+                     by interacting with their partners (see Member.interaction_modifier)
+        Inputs:
+            - agents: agents whose characteristics are modified
+            - partners: agents being interacted with
+        Outputs:
+            - modification per agent
+        '''
+        chars = self.chars[agents]
+        mod = 1 / (chars[:, AUTONOMOUS] + chars[:, CONTINUOUS])
+
+        # Modify less when interaction is cynical
+        cynical = self.rng.integers(0, (19 * self.ses[agents]).astype(int) + 1) == 0
+        mod[cynical] /= 10
+
+        # Modify based on similarity between participants
+        return mod / distance_normalizer(self.distances(agents, partners))
+
+
+    def interact(self, agents):
+        '''
+        Description: lets agents attempt to interact with a random other agent, changing
+                     both their characteristics when the interaction happens
+        Inputs:
+            - agents: agents that attempt an interaction this step
+        '''
+
+        # Check whether personality would lead to interaction
+        self.instruments.count('interactions', len(agents))
+        agents = agents[(self.pps[agents] < 3) & (self.rng.integers(0, 2, len(agents)) == 1)]
+
+        # Pick interaction partners other than the agents themselves
+        partners = self.rng.integers(0, self.n_agents - 1, len(agents))
+        partners += partners >= agents
+
+        # Accept interaction based on path length and partner's personality
+        self.instruments.count('path_lookups', len(agents))
+        prob = 1 / (1 + np.exp(self.fermi_alpha * (self.path_lengths(agents, partners) - self.fermi_b)))
+        accepted = (prob >= self.rng.random(len(agents))) & (self.pps[partners] < 3) & \
+                   (self.rng.integers(0, 2, len(agents)) == 1)
+        agents, partners = agents[accepted], partners[accepted]
+        if not len(agents):
+            return
+
+        # Interact
+        mod = self.interaction_modifiers(agents, partners)
+        p_mod = self.interaction_modifiers(partners, agents)
+        delta = np.zeros_like(self.chars)
+
+        more_approaching = self.chars[agents, APPROACHING] > self.chars[partners, APPROACHING]
+        np.add.at(delta[:, APPROACHING], partners[more_approaching], p_mod[more_approaching])
+        np.add.at(delta[:, APPROACHING], agents[~more_approaching], mod[~more_approaching])
+
+        more_pp = self.pps[agents] >= self.pps[partners]
+        np.add.at(delta[:, ACTIVE], partners[more_pp], p_mod[more_pp])
+        np.add.at(delta[:, OVERT], agents[more_pp], mod[more_pp])
+        np.add.at(delta[:, ACTIVE], agents[~more_pp], mod[~more_pp])
+        np.add.at(delta[:, OVERT], partners[~more_pp], p_mod[~more_pp])
+        self.chars = np.clip(self.chars + delta, 0, 5)
+        self.trait_distances.changed(np.union1d(agents, partners))
+
+        # Update parameters
+        np.add.at(self.contacts, agents, 1)
+        np.add.at(self.contacts, partners, 1)
+
+
+    def distances(self, agents, partners):
+        '''
+        Description: calculates the Euclidean distance between the personality traits related
+                     to friendship and socio-economic status of pairs of agents (see Trait_distances)
+        Inputs:
+            - agents: first agent of each pair (or 1 agent for all pairs)
+            - partners: second agent of each pair
+        Outputs:
+            - distance per pair
+        '''
+        return self.trait_distances.between(agents, partners)
+
+
+    def fermi_dirac(self, agent, partners):
+        '''
+        Description: calculates the (Fermi Dirac) probability of an agent being connected to
+                     each of its potential partners
+        Inputs:
+            - agent: agent to consider connections of
+            - partners: agents to consider connecting to
+        Outputs:
+            - probability per partner
+        '''
+        distance = self.distances(agent, partners)
+        return 1 / (1 + np.exp(self.fermi_alpha * (distance - self.fermi_b)))
+
+
+    def new_social(self, agent):
+        '''
+        Description: adds new connections from the agent based on the Fermi-Dirac distribution
+                     to a sample of agents it is not yet connected to (see Member.new_social)
+        Inputs:
+            - agent: agent to add connections for
+        '''
+        candidates = np.array(self.graph.sample_unconnected(agent, self.edges_per_step, self.rng), dtype = int)
+
+        added = candidates[self.fermi_dirac(agent, candidates) > self.rng.random(len(candidates))]
+        self.instruments.count('edges_added', len(added))
+        for other in added:
+            self.paths.edge_changed(agent, other)
+            self.graph.add_edge(agent, int(other))
+
+
+    def remove_social(self, agent):
+        '''
+        Description: removes a few random connections of the agent with a probability determined
+                     by the Fermi-Dirac distribution (see Member.remove_social)
+        Inputs:
+            - agent: agent to remove connections for
+        '''
+        candidates = np.array(self.graph.sample_neighbours(agent, self.edges_per_step, self.rng), dtype = int)
+
+        removed = candidates[self.fermi_dirac(agent, candidates) < self.rng.random(len(candidates))]
+        self.instruments.count('edges_removed', len(removed))
+        for other in removed:
+            self.paths.edge_changed(agent, other)
+            self.graph.remove_edge(agent, int(other))
+
+
+    def update_pp(self):
+        '''
+        Description: calculates the political participation of all agents based on their
+                     characteristics (see Member.update_pp)
+        '''
+        base = (self.rng.uniform(0, 1, self.n_agents) <= .1).astype(int)
+        scores = pp_scores(self.chars, self.ses, self.contacts, self.time_in_community)
+        thresholds = draw_thresholds(self.rng, self.n_agents)
+        self.pps = cascade_pp(scores, thresholds, base, self.vote_duty, self.until_eligible_left == 0)
+
+
+    def get_agent_state(self):
+        '''
+        Description: collects the state of all agents that changes over time
+        Outputs:
+            - dictionary with an array per state variable
+        '''
+        return {'chars' : self.chars,
+                'ses' : self.ses,
+                'contacts' : self.contacts,
+                'time_in_community' : self.time_in_community,
+                'vote_duty' : self.vote_duty,
+                'until_eligible' : self.until_eligible_left,
+                'pps' : self.pps}
+
+
+    def set_agent_state(self, state):
+        '''
+        Description: sets the state of all agents
+        Inputs:
+            - state: dictionary with an array per state variable, made by get_agent_state
+        '''
+        self.chars = state['chars'].astype(float)
+        self.ses = state['ses'].astype(int)
+        self.contacts = state['contacts'].astype(int)
+        self.time_in_community = state['time_in_community'].astype(int)
+        self.vote_duty = state['vote_duty'].astype(bool)
+        self.until_eligible_left = state['until_eligible'].astype(int)
+        self.pps = state['pps'].astype(int)
+        self.trait_distances.changed()
+
+
+    def get_traits(self, agents = None):
+        '''
+        Description: collects the traits that distances between agents are based on
+        Inputs:
+            - agents: optional, agents to collect the traits of (None for all agents)
+        Outputs:
+            - array with the social, autonomous, approaching and ses of each agent
+        '''
+        if agents is None:
+            agents = slice(None)
+        return np.column_stack([self.chars[agents][:, [SOCIAL, AUTONOMOUS, APPROACHING]], self.ses[agents]])
+
+
+    def get_voters(self):
+        '''
+        Description: calculated the number of voters in the environment
+        Outputs:
+            - number of voters (number of agents in the model where pps >= 2)
+        '''
+        return int((self.pps >= 2).sum())
+
+
+    def get_pps(self):
+        '''
+        Description: returns the political participation of all agents
+        Outputs:
+            - array with the political participation per agent
+        '''
+        return self.pps